@@ -24,9 +24,9 @@ export default function AlbumSlider({ title, photos }) {
         {photos.map((photo, index) => (
           <SwiperSlide key={index} style={{ width: "auto" }}>
             <PhotoProvider>
-              <PhotoView src={photo.download_url}>
+              <PhotoView src={photo.urls?.medium || photo.download_url}>
                 <img
-                  src={photo.download_url}
+                  src={photo.urls?.thumb || photo.download_url}
                   alt="photo"
                   className="w-32 h-32 rounded-xl object-cover shadow-md cursor-pointer hover:scale-105 transition"
                 />
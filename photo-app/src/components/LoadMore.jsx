@@ -0,0 +1,32 @@
+import React, { useEffect, useRef } from "react";
+
+// Déclencheur de la page suivante : placé sous la grille, il appelle onLoadMore
+// quand il approche de l'écran (IntersectionObserver, aucun écouteur de scroll).
+// loaded : nombre d'éléments affichés ; l'observateur est relancé à chaque page pour
+// enchaîner la suivante si le déclencheur est encore visible
+export default function LoadMore({ hasMore, loaded, onLoadMore }) {
+  const sentinelRef = useRef(null);
+  const onLoadMoreRef = useRef(onLoadMore);
+  onLoadMoreRef.current = onLoadMore;
+
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!hasMore || !sentinel) return;
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) onLoadMoreRef.current();
+      },
+      // Chargement un écran avant d'atteindre le bas
+      { rootMargin: "600px 0px" }
+    );
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [hasMore, loaded]);
+
+  if (!hasMore) return null;
+  return (
+    <div ref={sentinelRef} className="py-6 text-center text-sm text-gray-500 dark:text-gray-400">
+      Chargement…
+    </div>
+  );
+}
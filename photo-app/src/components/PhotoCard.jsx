@@ -21,9 +21,9 @@ export default function PhotoCard({ photo, onDelete, onToggleFavorite }) {
 
       {/* Image avec zoom + amélioration visuelle */}
       <PhotoProvider>
-        <PhotoView src={photo.download_url}>
+        <PhotoView src={photo.urls?.medium || photo.download_url}>
           <img
-            src={photo.download_url}
+            src={photo.urls?.thumb || photo.download_url}
             alt={photo.labels?.[0] || "Photo"}
             className="w-full h-64 object-cover cursor-pointer transition-transform duration-300 hover:scale-110 rounded-t-3xl"
             style={{ filter: "contrast(110%) brightness(105%)" }}
@@ -27,9 +27,9 @@ export default function PhotoSlider({ photos }) {
         >
           {photos.map((photo, i) => (
             <PhotoProvider key={i}>
-              <PhotoView src={photo.download_url}>
+              <PhotoView src={photo.urls?.medium || photo.download_url}>
                 <img
-                  src={photo.download_url}
+                  src={photo.urls?.thumb || photo.download_url}
                   alt={`photo-${i}`}
                   className="w-36 h-36 object-cover rounded-2xl shadow-md hover:scale-105 transition-transform cursor-pointer"
                 />
@@ -1,7 +1,8 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import Navbar from "../components/Navbar";
-import { listPhotos, toggleFavorite, deletePhoto } from "../utils/api";
+import LoadMore from "../components/LoadMore";
+import { listFavoritePhotos, toggleFavorite, deletePhoto } from "../utils/api";
 import { PhotoProvider, PhotoView } from "react-photo-view";
 import "react-photo-view/dist/react-photo-view.css";
 import { motion, AnimatePresence } from "framer-motion";
@@ -11,6 +12,9 @@ export default function Favorites() {
   const navigate = useNavigate();
   const [token, setToken] = useState(null);
   const [photos, setPhotos] = useState([]);
+  // Jeton de la page suivante (null : tous les favoris sont chargés)
+  const [nextToken, setNextToken] = useState(null);
+  const loadingMore = useRef(false);
   const [darkMode, setDarkMode] = useState(() => localStorage.getItem("darkMode") === "true");
   const [search, setSearch] = useState("");
   const [notification, setNotification] = useState(null);
@@ -39,16 +43,29 @@ export default function Favorites() {
 
   const fetchFavoritePhotos = async (token) => {
     try {
-      const allPhotos = await listPhotos(token);
-      const favorites = allPhotos
-        .filter((p) => p.isFavorite === true)
-        .sort((a, b) => new Date(b.uploadedAt) - new Date(a.uploadedAt));
-      setPhotos(favorites);
+      // Le serveur ne lit que les favoris ; première page, la suite au défilement
+      const page = await listFavoritePhotos(token);
+      setPhotos(page.photos);
+      setNextToken(page.nextToken);
     } catch (err) {
       console.error("Erreur chargement favoris:", err);
     }
   };
 
+  const loadMoreFavorites = async () => {
+    if (loadingMore.current) return;
+    loadingMore.current = true;
+    try {
+      const page = await listFavoritePhotos(token, nextToken);
+      setPhotos((prev) => [...prev, ...page.photos]);
+      setNextToken(page.nextToken);
+    } catch (err) {
+      console.error("Erreur chargement favoris:", err);
+    } finally {
+      loadingMore.current = false;
+    }
+  };
+
   const handleToggleFavorite = async (photo) => {
     try {
       await toggleFavorite(token, photo.photo, photo.isFavorite);
@@ -134,9 +151,9 @@ export default function Favorites() {
                         key={photo.photo}
                         className="relative group bg-gray-900 text-white rounded-2xl shadow-xl p-4"
                       >
-                        <PhotoView src={photo.download_url || `https://oussama49.s3.us-east-2.amazonaws.com/${photo.photo}`}>
+                        <PhotoView src={photo.urls?.medium || photo.download_url || `https://oussama49.s3.us-east-2.amazonaws.com/${photo.photo}`}>
                           <img
-                            src={photo.download_url || `https://oussama49.s3.us-east-2.amazonaws.com/${photo.photo}`}
+                            src={photo.urls?.thumb || photo.download_url || `https://oussama49.s3.us-east-2.amazonaws.com/${photo.photo}`}
                             alt={photo.description || "Photo favorite"}
                             className="w-full h-64 object-cover rounded-xl transition-transform duration-300 group-hover:scale-105 cursor-zoom-in"
                           />
@@ -190,6 +207,7 @@ export default function Favorites() {
               ))}
             </PhotoProvider>
           )}
+          <LoadMore hasMore={Boolean(nextToken)} loaded={photos.length} onLoadMore={loadMoreFavorites} />
         </div>
       </div>
 
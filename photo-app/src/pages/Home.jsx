@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import Navbar from "../components/Navbar";
 import AlbumSlider from "../components/AlbumSlider";
@@ -12,12 +12,13 @@ import "react-photo-view/dist/react-photo-view.css";
 import PhotoCard from "../components/PhotoCard";
 import AlbumsSlider from "../components/AlbumsSlider";
 import UploadForm from "../components/UploadForm";
+import LoadMore from "../components/LoadMore";
 import { motion, AnimatePresence } from "framer-motion";
 import {
   generateUploadUrl,
-  analyzePhoto,
-  getLabels,
+  waitForLabels,
   listPhotos,
+  searchPhotos,
   createAlbum,
   listAlbums,
   deletePhoto,
@@ -32,6 +33,8 @@ export default function Home() {
   const navigate = useNavigate();
   const [token, setToken] = useState(null);
   const [photos, setPhotos] = useState([]);
+  // Jeton de la page suivante (null : tout est chargé)
+  const [photosNext, setPhotosNext] = useState(null);
   const [albums, setAlbums] = useState([]);
   const [file, setFile] = useState(null);
   const [albumName, setAlbumName] = useState("");
@@ -39,11 +42,20 @@ export default function Home() {
   const [description, setDescription] = useState("");
   const [location, setLocation] = useState("");
   const [searchTerm, setSearchTerm] = useState("");
+  // Résultats de GET /search, du plus pertinent au moins pertinent (null : pas de recherche)
+  const [searchMatches, setSearchMatches] = useState(null);
+  const [searchNext, setSearchNext] = useState(null);
   const [darkMode, setDarkMode] = useState(() => localStorage.getItem("darkMode") === "true");
   const [notification, setNotification] = useState(null);
   const [confirmDelete, setConfirmDelete] = useState(null);
   const [confirmDeleteAlbum, setConfirmDeleteAlbum] = useState(null);
   const [uploading, setUploading] = useState(false);
+  // Chargement en cours : un changement d'album abandonne les pages du précédent
+  const photosRequest = useRef(0);
+  // Album de la liste affichée et recherche des résultats affichés (pages suivantes)
+  const photosAlbum = useRef(null);
+  const searchResults = useRef({ q: "" });
+  const loadingMore = useRef(false);
 
   useEffect(() => {
     darkMode
@@ -62,6 +74,34 @@ export default function Home() {
     }
   }, [navigate]);
 
+  // Recherche sur toute la bibliothèque, pas seulement les photos chargées :
+  // description, lieu et étiquettes, mots partiels (« vacan », « pari ») compris
+  useEffect(() => {
+    const q = searchTerm.trimStart();
+    if (!token || q.trim().length < 2) {
+      searchResults.current = { q: "" };
+      setSearchMatches(null);
+      setSearchNext(null);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      searchPhotos(token, q)
+        .then((page) => {
+          if (cancelled) return;
+          // Le jeton de page suivante n'est valable que pour cette recherche
+          searchResults.current = { q };
+          setSearchMatches(page.photos);
+          setSearchNext(page.nextToken);
+        })
+        .catch((err) => console.error("Erreur recherche:", err));
+    }, 300);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, token]);
+
   const showNotification = (message, success = true) => {
     setNotification({ message, success });
     setTimeout(() => setNotification(null), 3000);
@@ -77,45 +117,79 @@ export default function Home() {
   };
 
   const fetchPhotos = async (token, albumId = null) => {
+    const request = ++photosRequest.current;
+    photosAlbum.current = albumId;
     try {
-      const res = await listPhotos(token, albumId);
-      const sorted = res.sort((a, b) => new Date(b.uploadedAt || 0) - new Date(a.uploadedAt || 0));
-      setPhotos(sorted);
+      // Première page seulement (les plus récentes) : la suite arrive au défilement
+      const page = await listPhotos(token, albumId);
+      if (request !== photosRequest.current) return;
+      setPhotos(page.photos);
+      setPhotosNext(page.nextToken);
     } catch (err) {
       console.error("Erreur chargement photos:", err);
     }
   };
 
+  // Page suivante de la liste affichée : bibliothèque (ou album) ou résultats de recherche
+  const loadMore = async () => {
+    if (loadingMore.current) return;
+    loadingMore.current = true;
+    try {
+      if (searchMatches) {
+        const search = searchResults.current;
+        const page = await searchPhotos(token, search.q, { nextToken: searchNext });
+        if (search !== searchResults.current) return;
+        setSearchMatches((prev) => [...prev, ...page.photos]);
+        setSearchNext(page.nextToken);
+      } else {
+        const request = photosRequest.current;
+        const page = await listPhotos(token, photosAlbum.current, photosNext);
+        if (request !== photosRequest.current) return;
+        setPhotos((prev) => [...prev, ...page.photos]);
+        setPhotosNext(page.nextToken);
+      }
+    } catch (err) {
+      console.error("Erreur chargement de la page suivante:", err);
+    } finally {
+      loadingMore.current = false;
+    }
+  };
+
   const handleUpload = async (e) => {
     e.preventDefault();
     if (!file) return showNotification("📌 Veuillez choisir une image.", false);
     try {
       setUploading(true);
-      const { upload_url, photo_key, download_url } = await generateUploadUrl(token, file.name, selectedAlbumId || null);
+      const { upload_url, upload_headers, photo_key, download_url } = await generateUploadUrl(
+        token,
+        file.name,
+        selectedAlbumId || null,
+        description,
+        location
+      );
+      // Les métadonnées signées (album, description, lieu) voyagent avec l'objet :
+      // l'analyse est déclenchée par S3, sans appel /analyze
       await fetch(upload_url, {
         method: "PUT",
-        headers: { "Content-Type": file.type },
+        headers: upload_headers || { "Content-Type": file.type },
         body: file,
       });
-      await analyzePhoto(token, photo_key, selectedAlbumId || null, description, location);
-      setTimeout(async () => {
-        const result = await getLabels(token, photo_key);
-        const newPhoto = {
-          photo: photo_key,
-          labels: result.labels,
-          albumId: selectedAlbumId || null,
-          description,
-          location,
-          uploadedAt: new Date().toISOString(),
-          download_url,
-          isFavorite: false,
-        };
-        setPhotos((prev) => [newPhoto, ...prev]);
-        setFile(null);
-        setDescription("");
-        setLocation("");
-        showNotification("✅ Photo uploadée et analysée !");
-      }, 2000);
+      const result = await waitForLabels(token, photo_key);
+      const newPhoto = {
+        photo: photo_key,
+        labels: result.labels,
+        albumId: selectedAlbumId || null,
+        description,
+        location,
+        uploadedAt: new Date().toISOString(),
+        download_url,
+        isFavorite: false,
+      };
+      setPhotos((prev) => [newPhoto, ...prev]);
+      setFile(null);
+      setDescription("");
+      setLocation("");
+      showNotification("✅ Photo uploadée et analysée !");
     } catch (err) {
       console.error(err);
       showNotification("❌ Erreur durant l'upload ou l'analyse.", false);
@@ -147,7 +221,10 @@ export default function Home() {
   const handleDeleteConfirmed = async () => {
     try {
       await deletePhoto(token, confirmDelete);
-      setPhotos((prev) => prev.filter((p) => p.photo !== confirmDelete));
+      // Même mise à jour sur les résultats de recherche affichés (null hors recherche)
+      const remove = (list) => list && list.filter((p) => p.photo !== confirmDelete);
+      setPhotos(remove);
+      setSearchMatches(remove);
       showNotification("✅ Photo supprimée !");
     } catch (err) {
       console.error("Erreur suppression photo:", err);
@@ -158,6 +235,8 @@ export default function Home() {
   };
 
   const handleDeleteAlbum = (albumId) => {
+    // Seules les pages chargées sont connues ici : une photo de l'album suffit à refuser
+    // tout de suite, sinon le serveur tranche (409)
     const hasPhotos = photos.some((p) => p.albumId === albumId);
     if (hasPhotos) return showNotification("❌ Impossible de supprimer un album contenant des photos.", false);
     setConfirmDeleteAlbum(albumId);
@@ -170,7 +249,7 @@ export default function Home() {
       showNotification("🗂️ Album supprimé !");
     } catch (err) {
       console.error(err);
-      showNotification("❌ Erreur suppression album", false);
+      showNotification(`❌ ${err.message}`, false);
     } finally {
       setConfirmDeleteAlbum(null);
     }
@@ -179,22 +258,19 @@ export default function Home() {
   const handleToggleFavorite = async (photo) => {
     try {
       await toggleFavorite(token, photo.photo, photo.isFavorite);
-      setPhotos((prev) =>
-        prev.map((p) => (p.photo === photo.photo ? { ...p, isFavorite: !photo.isFavorite } : p))
-      );
+      const toggle = (list) =>
+        list && list.map((p) => (p.photo === photo.photo ? { ...p, isFavorite: !photo.isFavorite } : p));
+      setPhotos(toggle);
+      setSearchMatches(toggle);
     } catch (err) {
       console.error("Erreur favori:", err);
       showNotification("❌ Impossible de changer le statut favori.", false);
     }
   };
 
-  const filteredPhotos = photos.filter((photo) => {
-    const term = searchTerm.toLowerCase();
-    return (
-      photo.labels?.some((label) => label.toLowerCase().includes(term)) ||
-      photo.description?.toLowerCase().includes(term)
-    );
-  });
+  // Sans recherche (moins de deux caractères), la bibliothèque chargée jusqu'ici
+  const filteredPhotos = searchMatches || photos;
+  const hasMore = Boolean(searchMatches ? searchNext : photosNext);
 
   const groupedByDate = filteredPhotos.reduce((acc, photo) => {
     const dateKey = new Date(photo.uploadedAt).toLocaleDateString("fr-CA", {
@@ -208,10 +284,6 @@ export default function Home() {
     return acc;
   }, {});
 
-  const favoriteAlbums = albums.filter((album) =>
-    photos.some((photo) => photo.albumId === album.albumId && photo.isFavorite)
-  );
-
   return (
     <>
       <Navbar
@@ -252,9 +324,9 @@ export default function Home() {
       {photos.map((photo, index) => (
        <SwiperSlide key={index} style={{ width: "200px" }}>
   <PhotoProvider>
-    <PhotoView src={photo.download_url}>
+    <PhotoView src={photo.urls?.medium || photo.download_url}>
       <img
-        src={photo.download_url}
+        src={photo.urls?.thumb || photo.download_url}
         alt={`photo-${index}`}
         className="h-48 w-48 object-cover rounded-xl shadow-lg transition hover:scale-105 cursor-pointer"
       />
@@ -363,7 +435,7 @@ export default function Home() {
               type="text"
               value={searchTerm}
               onChange={(e) => setSearchTerm(e.target.value)}
-              placeholder="🔍 Rechercher par tags ou description"
+              placeholder="🔍 Rechercher par tags, lieu ou description"
               className="w-full p-3 rounded-xl border shadow-sm focus:ring-2 focus:ring-indigo-300 dark:bg-gray-700 dark:text-white"
             />
           </div>
@@ -385,6 +457,7 @@ export default function Home() {
               </div>
             </section>
           ))}
+          <LoadMore hasMore={hasMore} loaded={filteredPhotos.length} onLoadMore={loadMore} />
         </div>
       </main>
     {/*  Notification animée */}
@@ -1,4 +1,6 @@
 const API_BASE = "https://9z8jnzq2ni.execute-api.us-east-2.amazonaws.com/Prod";
+// Taille des pages de /photos et /albums (le serveur accepte jusqu'à 200)
+const PAGE_SIZE = 50;
 
 // ✅ Créer un album
 export async function createAlbum(token, name) {
@@ -15,16 +17,24 @@ export async function createAlbum(token, name) {
   return await response.json();
 }
 
-// ✅ Lister les albums
+// ✅ Lister les albums (toutes les pages, les plus récents d'abord)
 export async function listAlbums(token) {
-  const response = await fetch(`${API_BASE}/albums`, {
-    method: "GET",
-    headers: { Authorization: `Bearer ${token}` },
-  });
+  let albums = [];
+  let nextToken = null;
+  do {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    if (nextToken) params.set("nextToken", nextToken);
+    const response = await fetch(`${API_BASE}/albums?${params}`, {
+      method: "GET",
+      headers: { Authorization: `Bearer ${token}` },
+    });
 
-  if (!response.ok) throw new Error("Erreur chargement albums");
-  const data = await response.json();
-  return Array.isArray(data) ? { albums: data } : data;
+    if (!response.ok) throw new Error("Erreur chargement albums");
+    const data = await response.json();
+    albums = albums.concat(data.albums || []);
+    nextToken = data.nextToken;
+  } while (nextToken);
+  return { albums };
 }
 
 // ✅ Supprimer un album
@@ -36,15 +46,19 @@ export async function deleteAlbum(token, albumId) {
     },
   });
 
+  // 409 : l'album contient encore des photos (vérifié côté serveur)
+  if (response.status === 409) throw new Error((await response.json()).message);
   if (!response.ok) throw new Error("Erreur suppression album");
   return await response.json();
 }
 
 // ✅ Générer une URL signée d’upload
-export async function generateUploadUrl(token, fileName, albumId = null) {
+export async function generateUploadUrl(token, fileName, albumId = null, description = "", location = "") {
   const query = new URLSearchParams();
   if (fileName) query.append("fileName", fileName);
   if (albumId) query.append("albumId", albumId);
+  if (description) query.append("description", description);
+  if (location) query.append("location", location);
 
   const response = await fetch(`${API_BASE}/upload-url?${query.toString()}`, {
     method: "GET",
@@ -52,7 +66,7 @@ export async function generateUploadUrl(token, fileName, albumId = null) {
   });
 
   if (!response.ok) throw new Error("Erreur génération URL upload");
-  return await response.json(); // { upload_url, photo_key, download_url }
+  return await response.json(); // { upload_url, upload_headers, photo_key, download_url }
 }
 
 // ✅ Analyser la photo (Rekognition)
@@ -87,29 +101,96 @@ export async function getLabels(token, photoKey) {
   return await response.json();
 }
 
-// ✅ Lister les photos
-export async function listPhotos(token, albumId = null) {
-  let url = `${API_BASE}/photos`;
-  if (albumId) url += `?albumId=${encodeURIComponent(albumId)}`;
+// ✅ Attendre la fin de l'analyse déclenchée par l'upload S3
+// L'analyse est déclenchée par S3 (invocation asynchrone) : file d'attente Lambda,
+// puis jusqu'à 60 s de traitement (timeout d'AnalyzePhotoFunction) pour un original
+// de 50 Mo. Le délai couvre les deux, avec des intervalles croissants
+export async function waitForLabels(token, photoKey, { timeout = 150000, interval = 1000, maxInterval = 10000 } = {}) {
+  const deadline = Date.now() + timeout;
+  for (let delay = interval; ; delay = Math.min(delay * 1.5, maxInterval)) {
+    try {
+      const result = await getLabels(token, photoKey);
+      if (result.rejected) throw new Error(`Photo refusée : ${result.rejected.reason}`);
+      if (result.processingVersion) return result;
+    } catch (err) {
+      if (err.message.startsWith("Photo refusée")) throw err;
+      // 404 tant que l'analyse n'a pas encore écrit l'entrée
+    }
+    if (Date.now() + delay > deadline) break;
+    await new Promise((resolve) => setTimeout(resolve, delay));
+  }
+  throw new Error("Analyse non terminée");
+}
+
+// ✅ Lister une page de photos (les plus récentes d'abord)
+export async function listPhotosPage(
+  token,
+  { albumId = null, favorite = false, labels = null, match = "all", limit = PAGE_SIZE, nextToken = null } = {}
+) {
+  const params = new URLSearchParams({ limit });
+  if (albumId) params.set("albumId", albumId);
+  if (favorite) params.set("favorite", "true");
+  if (labels?.length) {
+    params.set("label", labels.join(","));
+    params.set("match", match);
+  }
+  if (nextToken) params.set("nextToken", nextToken);
 
-  const response = await fetch(url, {
+  const response = await fetch(`${API_BASE}/photos?${params}`, {
     method: "GET",
     headers: { Authorization: `Bearer ${token}` },
   });
 
   if (!response.ok) throw new Error("Erreur chargement photos");
   const data = await response.json();
+  return { photos: data.photos.map(toPhoto), nextToken: data.nextToken || null };
+}
+
+// ✅ Lister les photos, une page à la fois : { photos, nextToken }.
+// La page suivante n'est demandée qu'au défilement (voir components/LoadMore)
+export async function listPhotos(token, albumId = null, nextToken = null) {
+  return listPhotosPage(token, { albumId, nextToken });
+}
+
+// ✅ Lister les favoris (index dédié : seuls les favoris sont lus), du plus récent au plus ancien
+export async function listFavoritePhotos(token, nextToken = null) {
+  return listPhotosPage(token, { favorite: true, nextToken });
+}
+
+// ✅ Recherche plein texte (description, lieu, étiquettes) : mots partiels, sans accents,
+// fautes de frappe tolérées. Une page de résultats, du plus pertinent au moins pertinent
+export async function searchPhotos(token, q, { limit = PAGE_SIZE, nextToken = null } = {}) {
+  const params = new URLSearchParams({ q, limit });
+  if (nextToken) params.set("nextToken", nextToken);
+
+  const response = await fetch(`${API_BASE}/search?${params}`, {
+    method: "GET",
+    headers: { Authorization: `Bearer ${token}` },
+  });
+
+  if (!response.ok) throw new Error("Erreur recherche");
+  const data = await response.json();
+  return {
+    photos: data.photos.map((photo) => ({ ...toPhoto(photo), score: photo.score })),
+    nextToken: data.nextToken || null,
+  };
+}
 
-  return data.map((photo) => ({
+function toPhoto(photo) {
+  return {
     photo: photo.photo,
     labels: photo.labels || [],
     albumId: photo.albumId || null,
     description: photo.description || "",
     location: photo.location || "",
     uploadedAt: photo.uploadedAt || null,
+    takenAt: photo.takenAt || null,
+    latitude: photo.latitude ?? null,
+    longitude: photo.longitude ?? null,
     download_url: photo.download_url || null,
+    urls: photo.urls || {},
     isFavorite: photo.isFavorite || false,
-  }));
+  };
 }
 
 // ✅ Supprimer une photo
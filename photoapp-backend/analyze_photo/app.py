@@ -1,55 +1,205 @@
 import boto3
 import os
 import json
-import io
+import hashlib
+import random
+import struct
+import time
+import tempfile
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from PIL import Image, ImageEnhance
+from decimal import Decimal
+from urllib.parse import unquote, unquote_plus
+from boto3.dynamodb.types import Binary
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from PIL import Image, ImageStat
+import budget
+import encoder
+import exif
+import label_index
+import metrics
+import pipeline
+import policy
+import probe
+import search_index
+from rate_limiter import TokenBucket
 
-rekognition = boto3.client('rekognition')
+# Les réessais sur throttling sont gérés par notre couche d’admission (call_rekognition),
+# pas par botocore : évite les tempêtes de réessais empilés
+rekognition = boto3.client('rekognition', config=Config(retries={'total_max_attempts': 1}))
 s3 = boto3.client('s3')
+sqs = boto3.client('sqs')
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['TABLE_NAME'])
+# Résultats d’analyse indexés par empreinte SHA-256 du contenu original
+cache_table = dynamodb.Table(os.environ['CACHE_TABLE'])
+# Suivi des analyses asynchrones (POST /analyze avec "async": true)
+jobs_table = dynamodb.Table(os.environ['JOBS_TABLE'])
+# Index inversé (utilisateur, étiquette, photo) de GET /photos?label=…
+label_index_table = dynamodb.Table(os.environ['LABEL_INDEX_TABLE'])
+# Index plein texte (mots et trigrammes) de GET /search?q=…
+search_index_table = dynamodb.Table(os.environ['SEARCH_INDEX_TABLE'])
+# Sans file SQS configurée (sam local, tests), les jobs tournent dans un thread local
+JOBS_QUEUE_URL = os.environ.get('JOBS_QUEUE_URL')
+
+# Nombre d’images traitées en parallèle dans un lot (S3, SQS ou POST /analyze multi-photos)
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', '8'))
+MAX_BATCH_PHOTOS = 50
+
+# Pool réutilisé entre invocations « chaudes » pour paralléliser les appels réseau
+executor = ThreadPoolExecutor(max_workers=2 * BATCH_WORKERS)
+# Pool du moteur de lots : chaque tâche est un pipeline complet (téléchargement, décodage, Rekognition)
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+# Pool séparé pour le stand-in local de la file : un job occupe son thread jusqu’au bout
+local_jobs = ThreadPoolExecutor(max_workers=2)
+
+# Dérivés générés à partir d’un seul décodage ; l’original reste intact dans photo/
+DERIVATIVE_SIZES = {
+    'medium': (1024, 768),
+    'thumb': (256, 256),
+}
+ORIGINALS_PREFIX = 'photo/'
+PROCESSED_PREFIX = 'processed/'
+# Marqueur posé sur chaque objet produit par le pipeline (métadonnée x-amz-meta-processing-version)
+PROCESSING_VERSION = '1'
+# Réglages de ton : contraste puis luminosité, composés en une seule table de correspondance
+CONTRAST = 1.2
+BRIGHTNESS = 1.1
+CHUNK_SIZE = 1024 * 1024
+# Au-delà de cette taille, l’original déborde de la mémoire vers /tmp
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+# Budget Rekognition par instance : TPS du compte / concurrence réservée de la fonction
+# (ReservedConcurrentExecutions dans template.yaml). REKOGNITION_TPS impose un débit direct
+REKOGNITION_ACCOUNT_TPS = float(os.environ.get('REKOGNITION_ACCOUNT_TPS', '50'))
+REKOGNITION_CONCURRENCY = int(os.environ.get('REKOGNITION_CONCURRENCY', '10'))
+REKOGNITION_TPS = float(os.environ.get('REKOGNITION_TPS') or REKOGNITION_ACCOUNT_TPS / REKOGNITION_CONCURRENCY)
+REKOGNITION_MAX_ATTEMPTS = 6
+# Attente maximale dans la file d’admission avant d’abandonner
+REKOGNITION_ADMISSION_TIMEOUT = 20
+THROTTLING_ERRORS = ('ThrottlingException', 'ProvisionedThroughputExceededException', 'LimitExceededException')
+# Image refusée par Rekognition (JPEG corrompu lu via S3Object, dimensions hors limites) :
+# même traitement que les refus de probe, sans réessai
+REJECTED_IMAGE_ERRORS = {
+    'InvalidImageFormatException': (415, "Format refusé par Rekognition"),
+    'ImageTooLargeException': (413, "Image trop grande pour Rekognition")
+}
+# Un seau par API : chaque opération Rekognition a son propre quota TPS
+rekognition_buckets = {
+    operation: TokenBucket(REKOGNITION_TPS)
+    for operation in ('detect_labels', 'detect_text', 'detect_moderation_labels')
+}
+# Un traitement interrompu libère sa réservation après ce délai
+CLAIM_TIMEOUT_SECONDS = 300
+# Les jobs terminés expirent (TTL DynamoDB) après une semaine
+JOB_TTL_SECONDS = 7 * 24 * 3600
+
+# Limites de Rekognition quand il lit l’original dans S3 (S3Object) : au-delà,
+# l’analyse passe forcément par le dérivé encodé
+REKOGNITION_MAX_S3_BYTES = 15 * 1024 * 1024
+REKOGNITION_MAX_DIMENSION = 4096
+# Temps gardé en réserve avant le timeout Lambda pour rendre la main proprement
+DEADLINE_MARGIN_SECONDS = 2
+# Délai d’intégration d’API Gateway (POST /analyze), plus court que le Timeout de la fonction
+API_GATEWAY_TIMEOUT_SECONDS = 29
+# Coûts de départ des étapes (secondes par Mo, par mégapixel source ou par appel),
+# remplacés au fil des mesures par ceux observés sur l’instance
+STAGE_COST_PRIORS = {
+    'download': 0.05,
+    'decode': 0.05,
+    'enhance': 0.05,
+    'encode': 1.0,
+    'labels': 1.5,
+    'text': 1.5,
+    'moderation': 1.0,
+    'record': 0.1,
+}
+stage_costs = budget.CostModel(STAGE_COST_PRIORS)
+# Première invocation de l’instance (cold start) tant que lambda_handler n’a pas rendu la main
+warm = False
+
+# Étapes de l’ingestion, dans l’ordre d’exécution (enregistrées plus bas avec @ingest_pipeline.stage).
+# Les étapes facultatives peuvent être coupées par DISABLED_STAGES, ex. "enhance,lookup"
+PIPELINE = ['probe', 'plan', 'download', 'lookup', 'policy', 'decode', 'enhance', 'encode', 'upload', 'analyze', 'remember', 'record', 'index', 'commit']
+# Job de suivi (étapes reportées) : mêmes étapes de traitement, sans Rekognition
+FOLLOW_UP_PIPELINE = ['probe', 'download', 'policy', 'decode', 'enhance', 'encode', 'upload', 'complete']
+DISABLED_STAGES = [name for name in os.environ.get('DISABLED_STAGES', '').split(',') if name]
+# Étapes sautées pour chaque report décidé par plan_stages
+DEFERRABLE_STAGES = {
+    'enhance': ['enhance'],
+    'derivatives': ['download', 'lookup', 'policy', 'decode', 'enhance', 'encode', 'upload', 'remember'],
+}
+# Analyseurs Rekognition lancés en parallèle par l’étape analyze, sur les mêmes octets,
+# avec les attributs qu’ils écrivent sur la photo. Seules les étiquettes sont obligatoires :
+# les autres peuvent être coupés par DISABLED_ANALYZERS, ex. "text"
+ANALYZER_FIELDS = {
+    'labels': ['labels', 'labelDetail'],
+    'text': ['text'],
+    'moderation': ['moderation', 'flagged'],
+}
+REQUIRED_ANALYZERS = ['labels']
+DISABLED_ANALYZERS = [name for name in os.environ.get('DISABLED_ANALYZERS', '').split(',') if name]
+MIN_TEXT_CONFIDENCE = 80
+MIN_MODERATION_CONFIDENCE = 60
+# Réponse complète de detect_labels conservée (labelDetail) jusqu’à ces limites :
+# les seuils d’affichage s’appliquent à la lecture (get_labels, listPhotos), sans repasser par Rekognition
+STORED_MIN_CONFIDENCE = 50
+STORED_MAX_LABELS = 100
+# Vue par défaut écrite dans labels, pour les lecteurs qui ne décodent pas labelDetail
+DEFAULT_MIN_CONFIDENCE = 80
+DEFAULT_MAX_LABELS = 10
+ingest_pipeline = pipeline.Pipeline(executor)
 
 def lambda_handler(event, context):
+    global warm
+    # Le pic mémoire mesuré (PeakMemory) part de cette invocation, pas du démarrage de l’instance
+    reset_peak_memory()
     try:
         print("EVENT:", json.dumps(event))
+        # Requête API synchrone : le client reçoit un 504 d’API Gateway bien avant le timeout Lambda
+        limit = API_GATEWAY_TIMEOUT_SECONDS if 'body' in event else None
+        deadline = budget.Budget.from_context(context, DEADLINE_MARGIN_SECONDS, limit)
 
         if 'body' in event:
             body = json.loads(event.get('body', '{}'))
-            photo_key = body.get('photo')
-            album_id = body.get('albumId')
-            description = body.get('description', '')
-            location = body.get('location', '')
             bucket_name = os.environ['BUCKET_NAME']
 
             claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
-            user_id = claims.get('sub')
-
-            # ✅ Appliquer le traitement image
-            process_image(bucket_name, photo_key)
-
-            return analyze_and_save(
-                bucket=bucket_name,
-                key=photo_key,
-                user_id=user_id,
-                album_id=album_id,
-                description=description,
-                location=location,
-                cors=True
-            )
 
-        elif 'Records' in event:
-            for record in event['Records']:
-                bucket = record['s3']['bucket']['name']
-                key = record['s3']['object']['key']
+            # Plusieurs photos en un seul appel : analysées en parallèle
+            if 'photos' in body:
+                return analyze_many(bucket_name, body, claims, deadline)
+
+            photo_key = body.get('photo')
+            fields = request_fields(bucket_name, photo_key, body, claims)
 
-                process_image(bucket, key)  # ✅ Traitement auto via S3
+            # Mode asynchrone : 202 immédiat, le worker SQS exécute le pipeline
+            if body.get('async'):
+                return enqueue_analysis(bucket_name, photo_key, fields)
 
-                analyze_and_save(bucket, key, cors=False)
+            return ingest(bucket=bucket_name, key=photo_key, cors=True, deadline=deadline, **fields)
+
+        elif 'Records' in event and event['Records'][0].get('eventSource') == 'aws:sqs':
+            return run_jobs(event['Records'], deadline)
+
+        elif 'Records' in event:
+            # ✅ Traitement auto via S3 : tous les objets du lot en parallèle
+            results = run_batch(lambda record: ingest_s3_record(record, deadline), event['Records'])
+            failed = [
+                unquote_plus(record['s3']['object']['key'])
+                for record, _, error in results if error
+            ]
+            # Invocation asynchrone : seule une exception déclenche les réessais de Lambda
+            # (puis la file d’échecs). Les objets déjà traités du lot sont sautés au réessai
+            if failed:
+                raise IngestFailed(f"Analyse S3 en échec : {', '.join(failed)}")
 
             return {
                 'statusCode': 200,
-                'body': json.dumps({'message': 'Analyse S3 réussie.'})
+                'body': json.dumps({'message': 'Analyse S3 réussie.', 'failed': []})
             }
 
         else:
@@ -59,75 +209,1022 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': 'Format d’événement non reconnu.'})
             }
 
+    except IngestFailed:
+        raise
     except Exception as e:
         return {
             'statusCode': 500,
             'headers': default_cors(),
             'body': json.dumps({'message': f"Erreur : {str(e)}"})
         }
+    finally:
+        warm = True
 
-def process_image(bucket, key):
-    try:
-        # Télécharger l’image originale depuis S3
-        response = s3.get_object(Bucket=bucket, Key=key)
-        image_bytes = response['Body'].read()
+class IngestFailed(Exception):
+    pass
 
-        # Ouvrir l’image
-        image = Image.open(io.BytesIO(image_bytes))
-        image = image.convert("RGB")  # ✅ Assure compatibilité JPEG
+def request_fields(bucket, key, body, claims):
+    # Les métadonnées liées à l’upload font foi ; le corps ne sert qu’aux anciens clients
+    upload = read_upload_metadata(bucket, key)
+    return {
+        'user_id': upload.get('user-id') or claims.get('sub'),
+        'album_id': upload.get('album-id') or body.get('albumId'),
+        'description': upload.get('description') or body.get('description', ''),
+        'location': upload.get('location') or body.get('location', '')
+    }
 
-        # Resize max 1024x768
-        image.thumbnail((1024, 768))
+def ingest_s3_record(record, deadline=None):
+    bucket = record['s3']['bucket']['name']
+    key = unquote_plus(record['s3']['object']['key'])
 
-        # Améliorer contraste et luminosité
-        image = ImageEnhance.Contrast(image).enhance(1.2)
-        image = ImageEnhance.Brightness(image).enhance(1.1)
+    # Garde de génération : nos propres écritures ne relancent jamais le pipeline
+    if not key.startswith(ORIGINALS_PREFIX) or key.startswith(PROCESSED_PREFIX):
+        print(f"⏭️ Objet ignoré (hors {ORIGINALS_PREFIX}) : {key}")
+        return None
+    upload = read_upload_metadata(bucket, key)
+    if 'processing-version' in upload:
+        print(f"⏭️ Objet ignoré (déjà produit par le pipeline) : {key}")
+        return None
 
-        # Sauvegarder dans un buffer
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=85)
-        buffer.seek(0)
+    # Métadonnées posées par l’URL d’upload
+    return ingest(
+        bucket,
+        key,
+        user_id=upload.get('user-id'),
+        album_id=upload.get('album-id'),
+        description=upload.get('description'),
+        location=upload.get('location'),
+        cors=False,
+        deadline=deadline
+    )
 
-        # Écraser l’image traitée dans S3
-        s3.put_object(Bucket=bucket, Key=key, Body=buffer, ContentType='image/jpeg')
-        print(f"✅ Image traitée et sauvegardée : {key}")
+def run_batch(func, items):
+    # Durée totale ≈ celle de l’élément le plus lent, et non la somme ;
+    # une erreur n’interrompt pas le reste du lot
+    def run_one(item):
+        try:
+            return item, func(item), None
+        except Exception as e:
+            print("❌ Erreur dans le lot :", str(e))
+            return item, None, e
 
-    except Exception as e:
-        print(f"❌ Erreur traitement image ({key}):", str(e))
+    return list(batch_pool.map(run_one, items))
 
-def analyze_and_save(bucket, key, user_id=None, album_id=None, description=None, location=None, cors=False):
-    response = rekognition.detect_labels(
-        Image={'S3Object': {'Bucket': bucket, 'Name': key}},
-        MaxLabels=10,
-        MinConfidence=80
-    )
+def analyze_many(bucket, body, claims, deadline=None):
+    photo_keys = body.get('photos') or []
+    if not photo_keys or len(photo_keys) > MAX_BATCH_PHOTOS:
+        return {
+            'statusCode': 400,
+            'headers': default_cors(),
+            'body': json.dumps({'message': f"Entre 1 et {MAX_BATCH_PHOTOS} photos par requête."})
+        }
+
+    def analyze_one(key):
+        fields = request_fields(bucket, key, body, claims)
+        if body.get('async'):
+            return enqueue_analysis(bucket, key, fields)
+        return ingest(bucket, key, cors=False, deadline=deadline, **fields)
+
+    results = []
+    failed = 0
+    for key, result, error in run_batch(analyze_one, photo_keys):
+        if error:
+            failed += 1
+            results.append({'photo': key, 'statusCode': 500, 'message': f"Erreur : {str(error)}"})
+        else:
+            results.append({'photo': key, 'statusCode': result['statusCode'], **json.loads(result['body'])})
 
-    labels = [label['Name'] for label in response['Labels']]
+    return {
+        'statusCode': 200,
+        'headers': default_cors(),
+        'body': json.dumps({
+            'results': results,
+            'succeeded': len(results) - failed,
+            'failed': failed
+        })
+    }
 
-    item = {
+def enqueue_analysis(bucket, key, fields):
+    job_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    jobs_table.put_item(Item={
+        'jobId': job_id,
         'photo': key,
-        'labels': labels,
-        'uploadedAt': datetime.utcnow().isoformat()
+        'userId': fields.get('user_id'),
+        'status': 'queued',
+        'createdAt': now,
+        'updatedAt': now,
+        'expiresAt': int(time.time()) + JOB_TTL_SECONDS
+    })
+
+    message = {'jobId': job_id, 'bucket': bucket, 'key': key, 'fields': fields}
+    if JOBS_QUEUE_URL:
+        sqs.send_message(QueueUrl=JOBS_QUEUE_URL, MessageBody=json.dumps(message))
+    else:
+        local_jobs.submit(run_job, message)
+
+    return {
+        'statusCode': 202,
+        'headers': default_cors(),
+        'body': json.dumps({'message': 'Analyse planifiée.', 'jobId': job_id, 'status': 'queued'})
+    }
+
+def run_jobs(records, deadline=None):
+    # Les messages en échec sont rendus à SQS (ReportBatchItemFailures), les autres sont acquittés
+    def run_message(record):
+        message = json.loads(record['body'])
+        if 'followUp' in message:
+            return complete_deferred(message['bucket'], message['key'])
+        return run_job(message, deadline)
+
+    results = run_batch(run_message, records)
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': record['messageId']}
+            for record, _, error in results if error
+        ]
     }
-    if user_id:
-        item['userId'] = user_id
-    if album_id:
-        item['albumId'] = album_id
-    if description:
-        item['description'] = description
-    if location:
-        item['location'] = location
 
-    table.put_item(Item=item)
+def run_job(message, deadline=None):
+    job_id = message['jobId']
+    update_job(job_id, 'running')
+    try:
+        result = ingest(message['bucket'], message['key'], cors=False, deadline=deadline, **message['fields'])
+    except Exception as e:
+        print(f"❌ Job {job_id} en échec :", str(e))
+        update_job(job_id, 'failed', error=str(e))
+        raise
+
+    body = json.loads(result['body'])
+    if result['statusCode'] == 200:
+        update_job(job_id, 'succeeded', labels=body.get('labels', []))
+    elif result['statusCode'] >= 400:
+        # Photo refusée au pré-contrôle : échec définitif, le message est acquitté
+        update_job(job_id, 'failed', error=body.get('message'))
+    # 202 : une autre exécution (déclenchée par S3) traite déjà l’objet ;
+    # GET /jobs/{id} lit alors le résultat directement sur la photo
+
+def update_job(job_id, status, labels=None, error=None):
+    names = {'#status': 'status'}
+    values = {':status': status, ':now': datetime.utcnow().isoformat()}
+    assignments = ['#status = :status', 'updatedAt = :now']
+    if labels is not None:
+        values[':labels'] = labels
+        assignments.append('labels = :labels')
+    if error is not None:
+        values[':error'] = error
+        assignments.append('#error = :error')
+        names['#error'] = 'error'
+
+    jobs_table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression='SET ' + ', '.join(assignments),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values
+    )
+
+def ingest(bucket, key, user_id=None, album_id=None, description=None, location=None, cors=False, deadline=None):
+    # Une seule ingestion par objet, quel que soit le point d’entrée (API ou S3)
+    previous = claim_ingest(key)
+    if previous is None:
+        return already_ingested(key, cors)
+
+    job = {
+        'bucket': bucket,
+        'key': key,
+        'deadline': deadline or budget.Budget(),
+        'fields': {
+            'userId': user_id,
+            'albumId': album_id,
+            'description': description,
+            'location': location
+        }
+    }
+    try:
+        run_pipeline(job)
+    except probe.Rejected as e:
+        return reject(key, e, cors)
+    except Exception:
+        # Réservation posée sur une photo encore inconnue : l’élément ne contient qu’elle
+        release_claim(key, created=not set(previous) - {'photo', 'ingestClaimedAt'})
+        raise
 
     result = {
         'statusCode': 200,
-        'body': json.dumps({'message': 'Analyse réussie.', 'labels': labels})
+        'body': json.dumps({
+            'message': 'Analyse réussie.',
+            **{field: value for field, value in job['analysis'].items() if field != 'labelDetail'}
+        })
+    }
+    if cors:
+        result['headers'] = default_cors()
+    return result
+
+def run_pipeline(job, names=PIPELINE):
+    started = time.monotonic()
+    outcome = 'failed'
+    try:
+        ingest_pipeline.run(ingest_pipeline.resolve(names, DISABLED_STAGES), job)
+        outcome = 'succeeded'
+    except probe.Rejected:
+        outcome = 'rejected'
+        raise
+    finally:
+        if job.get('image'):
+            job['image'].close()
+        if job.get('source'):
+            job['source'].close()
+        emit_pipeline_metrics(job, time.monotonic() - started, outcome)
+    return job
+
+def emit_pipeline_metrics(job, elapsed, outcome):
+    # Une ligne EMF par étape (dimension Stage) puis un résumé par image :
+    # de quoi retrouver l’étape dominante et dimensionner la mémoire
+    for timing in job.get('timings', []):
+        metrics.emit(
+            {
+                'StageDuration': (timing['ms'], 'Milliseconds'),
+                'StageBytesIn': (timing['bytesIn'], 'Bytes'),
+                'StageBytesOut': (timing['bytesOut'], 'Bytes')
+            },
+            dimensions={'Stage': timing['stage']},
+            properties={'photo': job['key'], 'kind': timing['kind']}
+        )
+    for timing in job.get('analyzerTimings', []):
+        metrics.emit(
+            {'AnalyzerDuration': (timing['ms'], 'Milliseconds')},
+            dimensions={'Analyzer': timing['analyzer']},
+            properties={'photo': job['key']}
+        )
+
+    header = job.get('header') or {}
+    summary = {
+        'IngestDuration': (round(elapsed * 1000, 1), 'Milliseconds'),
+        'SourceBytes': (header.get('size', 0), 'Bytes'),
+        'OutputBytes': (sum(job['encoding']['bytes'].values()) if job.get('encoding') else 0, 'Bytes'),
+        'SourcePixels': (header.get('width', 0) * header.get('height', 0), 'Count'),
+        'OutputPixels': (sum(job.get('outputPixels', {}).values()), 'Count')
+    }
+    # Pic depuis le début de l’invocation : celui de l’image quand elle est seule dans le lot,
+    # sinon il inclut les images traitées en parallèle. Absent hors Linux (pas de VmHWM)
+    peak = peak_memory_mb()
+    if peak is not None:
+        summary['PeakMemory'] = (peak, 'Megabytes')
+    metrics.emit(
+        summary,
+        dimensions={'ColdStart': 'cold' if not warm else 'warm'},
+        properties={
+            'photo': job['key'],
+            'outcome': outcome,
+            'policy': job.get('policy'),
+            'format': header.get('format'),
+            'skipped': sorted(job.get('skip', [])),
+            'stages': {timing['stage']: timing['ms'] for timing in job.get('timings', [])},
+            'analyzers': {timing['analyzer']: timing['ms'] for timing in job.get('analyzerTimings', [])},
+            'analyzersSkipped': job.get('analyzersSkipped', [])
+        }
+    )
+
+@ingest_pipeline.observe
+def record_stage_cost(stage, elapsed, job):
+    # Alimente le modèle de coûts de plan_stages, dans l’unité de chaque étape
+    if stage.name not in STAGE_COST_PRIORS:
+        return
+    # Un encodage sans recherche ne renseigne pas sur le coût d’un traitement complet
+    if stage.name == 'encode' and job.get('policy', policy.FULL) != policy.FULL:
+        return
+    header = job['header']
+    units = {
+        'download': header['size'] / (1024 * 1024),
+        'decode': header['width'] * header['height'] / 1_000_000,
+    }.get(stage.name, 1)
+    stage_costs.record(stage.name, elapsed, units)
+
+@ingest_pipeline.stage('probe', 'fetch')
+def probe_stage(job):
+    # Pré-contrôle sur les premiers Ko : les fichiers invalides ou démesurés
+    # ne sont ni téléchargés, ni décodés, ni envoyés à Rekognition
+    header = probe.probe_object(s3, job['bucket'], job['key'])
+    job['header'] = header
+    print(f"🔎 {job['key']} : {header['format']} {header['width']}x{header['height']}, {header['size'] // 1024} Ko")
+    return {'bytes_in': len(header['head'])}
+
+@ingest_pipeline.stage('plan', 'analyze')
+def plan_stage(job):
+    deferred = plan_stages(job['header'], job['deadline'])
+    job['deferred'] = deferred
+    for name in deferred:
+        job['skip'].update(DEFERRABLE_STAGES[name])
+    if deferred:
+        print(f"⏱️ {job['key']} : {job['deadline'].remaining():.1f}s restantes, report de {', '.join(deferred)}")
+
+@ingest_pipeline.stage('download', 'fetch')
+def download_stage(job):
+    # Un seul téléchargement (le reste après l’en-tête) : l’empreinte est calculée pendant le transfert
+    header = job['header']
+    job['source'], job['contentHash'] = open_source(job['bucket'], job['key'], header)
+    return {'bytes_in': header['size'] - len(header['head']), 'bytes_out': header['size']}
+
+@ingest_pipeline.stage('lookup', 'fetch', optional=True)
+def lookup_stage(job):
+    # Contenu déjà analysé : ni décodage, ni encodage, ni Rekognition
+    cached = reuse_cached_analysis(job['bucket'], job['key'], job['contentHash'])
+    if not cached:
+        return None
+    job.update(cached)
+    job['deferred'] = []
+    job['skip'].update(['policy', 'decode', 'enhance', 'encode', 'upload', 'analyze', 'remember'])
+    return {'bytes_out': sum(cached['encoding']['bytes'].values()) if cached.get('encoding') else 0}
+
+@ingest_pipeline.stage('policy', 'analyze', optional=True)
+def policy_stage(job):
+    # Traitement minimal suffisant, décidé sur l’en-tête sondé et les tables de
+    # quantification du JPEG : aucun pixel n’est décodé ici
+    source = job['source']
+    with Image.open(source) as image:
+        inspected = policy.inspect(image)
+    source.seek(0)
+
+    decision, reason = policy.choose(job['header'], inspected, DERIVATIVE_SIZES['medium'])
+    job['policy'] = decision
+    job['sourceQuality'] = inspected['quality']
+    emit_metric(f"Policy{decision.capitalize()}", 1)
+    if decision == policy.FULL:
+        print(f"🧭 {job['key']} : traitement complet ({reason})")
+        return None
+
+    # Ni amélioration, ni recherche de format : une seule passe d’encodage
+    job['skip'].add('enhance')
+    saved = stage_costs.estimate('enhance') + stage_costs.estimate('encode')
+    print(f"🧭 {job['key']} : {decision} ({reason}), ~{saved * 1000:.0f} ms CPU évitées")
+    emit_metric('PolicyCpuSaved', round(saved * 1000), 'Milliseconds')
+
+@ingest_pipeline.stage('decode', 'decode', degradable=True)
+def decode_stage(job):
+    # Décoder l’original à la plus grande taille utile ; toutes les étapes suivantes
+    # travaillent sur cette même image. En passage tel quel, seule la vignette est produite
+    size = DERIVATIVE_SIZES['thumb' if job.get('policy') == policy.PASS_THROUGH else 'medium']
+    job['image'], job['metadata'] = decode_image(job['source'], size)
+    return {'bytes_in': job['header']['size'], 'bytes_out': pixel_bytes(job['image'])}
+
+@ingest_pipeline.stage('enhance', 'transform', optional=True, degradable=True)
+def enhance_stage(job):
+    # Améliorer contraste et luminosité
+    job['image'] = enhance(job['image'])
+    return {'bytes_in': pixel_bytes(job['image']), 'bytes_out': pixel_bytes(job['image'])}
+
+@ingest_pipeline.stage('encode', 'encode', degradable=True)
+def encode_stage(job):
+    # Encoder chaque dérivé en mémoire (les uploads S3 sont faits en parallèle de Rekognition),
+    # du plus grand au plus petit pour réduire à partir de l’image déjà redimensionnée.
+    # Format et qualité sont choisis sur le premier dérivé, puis réutilisés pour les suivants
+    image = job['image']
+    bytes_in = pixel_bytes(image)
+    decision = job.get('policy', policy.FULL)
+    # Pas de génération de perte supplémentaire : au plus la qualité de la source
+    quality = min(job.get('sourceQuality') or encoder.BASELINE_QUALITY, encoder.BASELINE_QUALITY)
+    if decision == policy.PASS_THROUGH:
+        job['source'].seek(0)
+        original = encoder.strip_jpeg_metadata(job['source'].read())
+        chosen, derivatives, pixels = encode_derivatives(image, fixed=('jpeg', quality), medium=original)
+        pixels['medium'] = job['header']['width'] * job['header']['height']
+    elif decision == policy.RESIZE:
+        chosen, derivatives, pixels = encode_derivatives(image, fixed=('jpeg', quality))
+    else:
+        chosen, derivatives, pixels = encode_derivatives(image)
+    job['outputPixels'] = pixels
+    job['image'] = None
+    image.close()
+
+    report_encoding(job['key'], chosen, derivatives)
+    job['derivativeData'] = derivatives
+    job['format'] = chosen['format']
+    # Rekognition n’accepte que JPEG/PNG : l’encodage JPEG de référence lui est transmis
+    job['analysisBytes'] = chosen['data'] if chosen['format'] == 'jpeg' else chosen['baseline']
+    job['encoding'] = {
+        'policy': decision,
+        'format': chosen['format'],
+        'quality': chosen['quality'],
+        'bytes': {size: len(data) for size, data in derivatives.items()},
+        'baselineBytes': len(chosen['baseline'])
+    }
+    if chosen['ssim'] is not None:
+        job['encoding']['ssim'] = Decimal(str(round(chosen['ssim'], 4)))
+    return {'bytes_in': bytes_in, 'bytes_out': sum(len(data) for data in derivatives.values())}
+
+@ingest_pipeline.stage('upload', 'sink', overlap=True)
+def upload_stage(job):
+    # En arrière-plan pendant l’analyse Rekognition
+    if 'derivativeData' not in job:
+        return None  # décodage ou encodage en échec
+    extension = 'jpg' if job['format'] == 'jpeg' else job['format']
+    derivatives = {}
+    for size, data in job.pop('derivativeData').items():
+        derivatives[size] = derivative_key(job['key'], size, extension)
+        s3.put_object(
+            Bucket=job['bucket'],
+            Key=derivatives[size],
+            Body=data,
+            ContentType=encoder.content_type(job['format']),
+            Metadata={'processing-version': PROCESSING_VERSION}
+        )
+    job['derivatives'] = derivatives
+    print(f"✅ Dérivés sauvegardés : {', '.join(derivatives.values())}")
+    return {'bytes_in': sum(job['encoding']['bytes'].values())}
+
+@ingest_pipeline.stage('analyze', 'analyze')
+def analyze_stage(job):
+    if job.get('analysisBytes'):
+        image = {'Bytes': job['analysisBytes']}
+        bytes_in = len(job['analysisBytes'])
+    elif readable_from_s3(job['header']):
+        # Traitement impossible ou reporté : Rekognition lit l’original directement depuis S3
+        image = {'S3Object': {'Bucket': job['bucket'], 'Name': job['key']}}
+        bytes_in = job['header']['size']
+    else:
+        # Rekognition ne lit directement que des JPEG et PNG de taille raisonnable : pas de repli pour le reste
+        raise probe.Rejected(422, "Image illisible")
+
+    names = plan_analyzers(job)
+    # Analyseurs facultatifs sur le pool, étiquettes dans le thread courant :
+    # la durée de l’étape est celle du plus lent, pas la somme
+    futures = {name: executor.submit(run_analyzer, name, image, job['deadline']) for name in names[1:]}
+    results = [run_analyzer(names[0], image, job['deadline'])]
+    for name, future in futures.items():
+        try:
+            results.append(future.result())
+        except Exception as e:
+            # Un analyseur facultatif en échec n’empêche pas l’enregistrement de la photo
+            print(f"⚠️ Analyseur {name} en échec pour {job['key']} :", str(e))
+            job.setdefault('failed', []).append(name)
+
+    job['analysis'] = {}
+    job['analyzerTimings'] = []
+    for name, fields, elapsed in results:
+        job['analysis'].update(fields)
+        job['analyzerTimings'].append({'analyzer': name, 'ms': round(elapsed * 1000, 1)})
+        stage_costs.record(name, elapsed)
+    return {'bytes_in': bytes_in, 'bytes_out': len(json.dumps(job['analysis'], default=str))}
+
+def plan_analyzers(job):
+    # Les étiquettes d’abord ; un analyseur facultatif n’est lancé que si le budget
+    # restant couvre son coût mesuré (en parallèle : chacun est comparé seul au budget)
+    names = list(REQUIRED_ANALYZERS)
+    job['analyzersSkipped'] = []
+    reserve = stage_costs.estimate('record')
+    for name in ANALYZER_FIELDS:
+        if name in REQUIRED_ANALYZERS or name in DISABLED_ANALYZERS:
+            continue
+        if job['deadline'].affords(stage_costs.estimate(name) + reserve):
+            names.append(name)
+        else:
+            job['analyzersSkipped'].append(name)
+    if job['analyzersSkipped']:
+        print(f"⏱️ {job['key']} : analyseurs sautés faute de budget : {', '.join(job['analyzersSkipped'])}")
+    return names
+
+def run_analyzer(name, image, deadline):
+    started = time.monotonic()
+    fields = ANALYZERS[name](image, deadline)
+    return name, fields, time.monotonic() - started
+
+def analyze_labels(image, deadline):
+    response = call_rekognition(
+        rekognition.detect_labels,
+        Image=image,
+        MaxLabels=STORED_MAX_LABELS,
+        MinConfidence=STORED_MIN_CONFIDENCE,
+        deadline=deadline
+    )
+    rows = sorted((
+        [
+            label['Name'],
+            round(label['Confidence'], 1),
+            [parent['Name'] for parent in label.get('Parents', [])],
+            [category['Name'] for category in label.get('Categories', [])],
+            len(label.get('Instances', []))
+        ]
+        for label in response['Labels']
+    ), key=lambda row: -row[1])
+    return {
+        'labels': [row[0] for row in rows if row[1] >= DEFAULT_MIN_CONFIDENCE][:DEFAULT_MAX_LABELS],
+        'labelDetail': encode_label_detail(rows)
+    }
+
+def encode_label_detail(rows):
+    # Lignes [nom, confiance, parents, catégories, instances] par confiance décroissante,
+    # en JSON compressé (attribut binaire) : moins de 1 Ko pour 50 étiquettes
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'), 9)
+
+def analyze_text(image, deadline):
+    response = call_rekognition(rekognition.detect_text, Image=image, deadline=deadline)
+    # Lignes seulement : les mots (WORD) répètent le même texte découpé
+    return {'text': [
+        detection['DetectedText']
+        for detection in response['TextDetections']
+        if detection['Type'] == 'LINE' and detection['Confidence'] >= MIN_TEXT_CONFIDENCE
+    ]}
+
+def analyze_moderation(image, deadline):
+    response = call_rekognition(
+        rekognition.detect_moderation_labels,
+        Image=image,
+        MinConfidence=MIN_MODERATION_CONFIDENCE,
+        deadline=deadline
+    )
+    moderation = sorted({label['Name'] for label in response['ModerationLabels']})
+    return {'moderation': moderation, 'flagged': bool(moderation)}
+
+ANALYZERS = {
+    'labels': analyze_labels,
+    'text': analyze_text,
+    'moderation': analyze_moderation,
+}
+
+@ingest_pipeline.stage('remember', 'sink', optional=True)
+def remember_stage(job):
+    # Des dérivés non améliorés (étape reportée ou en échec) ou une analyse incomplète ne doivent pas servir
+    # à d’autres photos identiques
+    if job.get('deferred') or job.get('failed') or not job.get('derivatives'):
+        return None
+    cache_analysis(job['contentHash'], job['analysis'], job['derivatives'], job['encoding'], job.get('metadata', {}))
+
+@ingest_pipeline.stage('record', 'sink')
+def record_stage(job):
+    # Résultats de tous les analyseurs, écrits dans la même mise à jour.
+    # processingVersion n’est posé qu’à la fin (commit) : un échec d’indexation laisse
+    # la photo réanalysable par le réessai
+    item = dict(job['analysis'])
+    # Métadonnées d’upload, en ignorant les champs vides
+    item.update({name: value for name, value in job['fields'].items() if value})
+    for name in ('derivatives', 'encoding', 'contentHash'):
+        if job.get(name):
+            item[name] = job[name]
+    # Date de prise de vue, GPS et appareil : attributs de premier niveau, indexables
+    item.update(job.get('metadata', {}))
+    if job.get('deferred'):
+        item['deferred'] = job['deferred']
+
+    # La réservation est gardée jusqu’au commit : pas d’ingestion concurrente pendant l’indexation
+    job['photo'] = upsert_photo(job['key'], item, release=False)
+    return {'bytes_out': len(json.dumps(item, default=str))}
+
+@ingest_pipeline.stage('index', 'sink')
+def index_stage(job):
+    # Après l’écriture de la photo : propriétaire et date d’upload font partie des clés
+    indexed, removed = index_labels(job['key'], job['photo'])
+    print(f"🏷️ {job['key']} : {indexed} entrée(s) d’index, {removed} retirée(s)")
+    # Description, lieu et étiquettes tels qu’enregistrés (champs posés ailleurs compris)
+    photo = job['photo']
+    indexed, removed = search_index.sync(
+        search_index_table, job['key'], photo.get('userId'), photo.get('uploadedAt'), search_index.postings(photo)
+    )
+    print(f"🔎 {job['key']} : {indexed} terme(s) de recherche, {removed} retiré(s)")
+
+@ingest_pipeline.stage('commit', 'sink')
+def commit_stage(job):
+    # Photo et index à jour : l’ingestion est terminée, les événements suivants sont ignorés
+    upsert_photo(job['key'], {'processingVersion': PROCESSING_VERSION})
+    if job.get('deferred'):
+        schedule_follow_up(job['bucket'], job['key'], job['deferred'])
+
+@ingest_pipeline.stage('complete', 'sink')
+def complete_stage(job):
+    # Fin du job de suivi : dérivés définitifs, entrée du cache et fin du report
+    if job.get('failed'):
+        raise Exception(f"Traitement impossible : {job['key']}")
+    item = job['item']
+    # Le format choisi peut différer de celui des dérivés provisoires
+    for stale in set(item.get('derivatives', {}).values()) - set(job['derivatives'].values()):
+        s3.delete_object(Bucket=job['bucket'], Key=stale)
+
+    cache_analysis(job['contentHash'], job['analysis'], job['derivatives'], job['encoding'], job['metadata'])
+    upsert_photo(job['key'], {
+        'derivatives': job['derivatives'],
+        'encoding': job['encoding'],
+        **job['metadata'],
+        'contentHash': job['contentHash']
+    }, remove=['deferred'])
+    print(f"✅ Étapes reportées terminées : {job['key']}")
+
+def pixel_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+def plan_stages(header, deadline):
+    # Étiquettes et écriture sont obligatoires ; le reste n’est lancé que si le budget
+    # restant couvre son coût mesuré. Retourne les étapes reportées au job de suivi
+    required = stage_costs.estimate('labels') + stage_costs.estimate('record')
+    if not deadline.affords(required):
+        raise budget.DeadlineExceeded(f"{deadline.remaining():.1f}s restantes, {required:.1f}s nécessaires")
+
+    processing = (
+        stage_costs.estimate('download', header['size'] / (1024 * 1024))
+        + stage_costs.estimate('decode', header['width'] * header['height'] / 1_000_000)
+        + stage_costs.estimate('encode')
+    )
+    if deadline.affords(required + processing + stage_costs.estimate('enhance')):
+        return []
+    # Sans dérivé, Rekognition lirait l’original : les formats et tailles qu’il refuse
+    # doivent être décodés quel que soit le budget
+    if deadline.affords(required + processing) or not readable_from_s3(header):
+        return ['enhance']
+    return ['enhance', 'derivatives']
+
+def readable_from_s3(header):
+    # Original analysable par Rekognition sans passer par nos dérivés (S3Object)
+    return (
+        header['format'] in ('jpeg', 'png')
+        and header['size'] <= REKOGNITION_MAX_S3_BYTES
+        and max(header['width'], header['height']) <= REKOGNITION_MAX_DIMENSION
+    )
+
+def index_labels(key, photo):
+    detail = photo.get('labelDetail')
+    confidences = label_index.expand(photo.get('labels', []), detail.value if detail is not None else None)
+    return label_index.sync(label_index_table, key, photo.get('userId'), photo.get('uploadedAt'), confidences)
+
+def schedule_follow_up(bucket, key, deferred):
+    message = {'followUp': deferred, 'bucket': bucket, 'key': key}
+    if JOBS_QUEUE_URL:
+        sqs.send_message(QueueUrl=JOBS_QUEUE_URL, MessageBody=json.dumps(message))
+    else:
+        local_jobs.submit(run_follow_up, bucket, key)
+    emit_metric('StagesDeferred', len(deferred))
+
+def run_follow_up(bucket, key):
+    # Stand-in local de la file : personne ne relirait l’exception de la future
+    try:
+        complete_deferred(bucket, key)
+    except Exception as e:
+        print(f"❌ Étapes reportées en échec ({key}):", str(e))
+
+def complete_deferred(bucket, key):
+    # Job de suivi : dérivés et amélioration reportés faute de budget.
+    # Même pipeline, sans Rekognition : les étiquettes sont déjà enregistrées
+    item = table.get_item(Key={'photo': key}).get('Item', {})
+    if not item.get('deferred'):
+        return None
+
+    job = {
+        'bucket': bucket,
+        'key': key,
+        'deadline': budget.Budget(),
+        'item': item,
+        'analysis': stored_analysis(item)
     }
+    run_pipeline(job, FOLLOW_UP_PIPELINE)
+    return job['derivatives']
+
+def reject(key, error, cors):
+    # Refus définitif enregistré sur la photo : ni réessai, ni nouvelle analyse
+    print(f"🚫 {key} refusée : {error.reason}")
+    emit_metric('IngestRejected', 1)
+    # Les résultats d’une analyse précédente du même nom ne décrivent plus le contenu
+    stale = [field for fields in ANALYZER_FIELDS.values() for field in fields if field != 'labels']
+    upsert_photo(key, {
+        'labels': [],
+        'processingVersion': PROCESSING_VERSION,
+        'rejected': {'statusCode': error.status_code, 'reason': error.reason}
+    }, remove=stale)
+    # Contenu remplacé par un fichier refusé : plus rien à retrouver
+    label_index.sync(label_index_table, key, None, None, {})
+    search_index.sync(search_index_table, key, None, None, {})
+    result = {
+        'statusCode': error.status_code,
+        'body': json.dumps({'message': f"Photo refusée : {error.reason}", 'labels': []})
+    }
+    if cors:
+        result['headers'] = default_cors()
+    return result
+
+def read_upload_metadata(bucket, key):
+    # Valeurs encodées en URL par upload_url (les en-têtes S3 n’acceptent que l’ASCII)
+    metadata = s3.head_object(Bucket=bucket, Key=key).get('Metadata', {})
+    return {name: unquote(value) for name, value in metadata.items()}
+
+def claim_ingest(key):
+    # None si la photo est déjà analysée ou réservée, sinon l’élément tel qu’il était
+    # avant la réservation ({} : élément créé par update_item)
+    now = int(time.time())
+    try:
+        response = table.update_item(
+            Key={'photo': key},
+            UpdateExpression='SET ingestClaimedAt = :now',
+            ConditionExpression=(
+                '(attribute_not_exists(processingVersion) OR processingVersion <> :version) '
+                'AND (attribute_not_exists(ingestClaimedAt) OR ingestClaimedAt < :stale)'
+            ),
+            ExpressionAttributeValues={
+                ':now': now,
+                ':version': PROCESSING_VERSION,
+                ':stale': now - CLAIM_TIMEOUT_SECONDS
+            },
+            ReturnValues='ALL_OLD'
+        )
+        return response.get('Attributes', {})
+    except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+        return None
+
+def release_claim(key, created=False):
+    try:
+        if created:
+            # Sans quoi {'photo': key} resterait dans la table (et dans les listes) après
+            # un échec. La condition épargne une analyse enregistrée entre-temps
+            try:
+                table.delete_item(Key={'photo': key}, ConditionExpression='attribute_not_exists(processingVersion)')
+                return
+            except dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+                pass
+        table.update_item(Key={'photo': key}, UpdateExpression='REMOVE ingestClaimedAt')
+    except Exception as e:
+        print(f"⚠️ Impossible de libérer la réservation de {key} :", str(e))
+
+def already_ingested(key, cors):
+    item = table.get_item(Key={'photo': key}).get('Item', {})
+    if item.get('rejected'):
+        result = {
+            'statusCode': int(item['rejected']['statusCode']),
+            'body': json.dumps({'message': f"Photo refusée : {item['rejected']['reason']}", 'labels': []})
+        }
+    elif item.get('processingVersion') == PROCESSING_VERSION:
+        print(f"⏭️ Déjà analysée : {key}")
+        result = {
+            'statusCode': 200,
+            'body': json.dumps({'message': 'Analyse déjà effectuée.', 'labels': item.get('labels', [])})
+        }
+    else:
+        print(f"⏳ Analyse déjà en cours : {key}")
+        result = {
+            'statusCode': 202,
+            'body': json.dumps({'message': 'Analyse en cours.'})
+        }
     if cors:
         result['headers'] = default_cors()
     return result
 
+def derivative_key(key, size, extension='jpg'):
+    # ex. photo/abc.jpg -> processed/thumb/photo/abc.webp
+    return f"{PROCESSED_PREFIX}{size}/{key.rsplit('.', 1)[0]}.{extension}"
+
+def encode_derivatives(image, fixed=None, medium=None):
+    # fixed : (format, qualité) imposés par la politique ; medium : octets déjà prêts
+    derivatives = {}
+    pixels = {}
+    chosen = None
+    if medium is not None:
+        chosen = {'format': 'jpeg', 'quality': fixed[1], 'data': medium, 'ssim': None, 'baseline': medium}
+        derivatives['medium'] = medium
+    for size, max_size in DERIVATIVE_SIZES.items():
+        if size in derivatives:
+            continue
+        image.thumbnail(max_size)
+        pixels[size] = image.width * image.height
+        if chosen is None:
+            chosen = encoder.choose_encoding(image) if fixed is None else encoder.encode_fixed(image, *fixed)
+            derivatives[size] = chosen['data']
+        else:
+            derivatives[size] = encoder.encode(image, chosen['format'], chosen['quality'])
+    return chosen, derivatives, pixels
+
+def report_encoding(key, chosen, derivatives):
+    if chosen['ssim'] is None:
+        print(
+            f"📦 {key} : {chosen['format']} q{chosen['quality']} sans recherche, dérivés : "
+            + ', '.join(f"{name} {len(data) // 1024} Ko" for name, data in derivatives.items())
+        )
+        return
+    size = len(chosen['data'])
+    baseline = len(chosen['baseline'])
+    saved = baseline - size
+    print(
+        f"📦 {key} : {chosen['format']} q{chosen['quality']} (SSIM {chosen['ssim']:.4f}), "
+        f"{size // 1024} Ko au lieu de {baseline // 1024} Ko en JPEG q{encoder.BASELINE_QUALITY} "
+        f"({-100 * saved // max(baseline, 1)} %), dérivés : "
+        + ', '.join(f"{name} {len(data) // 1024} Ko" for name, data in derivatives.items())
+    )
+    emit_metric('EncodedBytesSaved', saved, 'Bytes')
+
+def open_source(bucket, key, header):
+    # Les octets lus par le pré-contrôle sont réutilisés : seule la suite est téléchargée,
+    # et IfMatch garantit qu’il s’agit bien du même objet
+    source = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    digest = hashlib.sha256(header['head'])
+    source.write(header['head'])
+    if len(header['head']) < header['size']:
+        # Copier le flux S3 par blocs : pas de copie intermédiaire de tout l’objet en bytes
+        response = s3.get_object(
+            Bucket=bucket,
+            Key=key,
+            Range=f"bytes={len(header['head'])}-",
+            IfMatch=header['etag']
+        )
+        for chunk in response['Body'].iter_chunks(CHUNK_SIZE):
+            digest.update(chunk)
+            source.write(chunk)
+    source.seek(0)
+    return source, digest.hexdigest()
+
+def reuse_cached_analysis(bucket, key, content_hash):
+    cached = cache_table.get_item(Key={'contentHash': content_hash}).get('Item')
+    if not cached:
+        emit_metric('AnalysisCacheMiss', 1)
+        return None
+    # Entrée antérieure aux analyseurs texte et modération (ou écrite sans eux, faute de budget) :
+    # la réutiliser priverait les doublons de ces résultats. Nouvelle analyse, qui remplace l’entrée
+    missing = [
+        name for name, fields in ANALYZER_FIELDS.items()
+        if name not in DISABLED_ANALYZERS and fields[0] not in cached
+    ]
+    if missing:
+        print(f"⚠️ Cache incomplet pour {key} ({', '.join(missing)}) : nouvelle analyse")
+        emit_metric('AnalysisCacheMiss', 1)
+        return None
+
+    # Même contenu déjà analysé : copie des dérivés côté S3, sans décodage ni Rekognition
+    derivative_keys = {}
+    encoding = cached.get('encoding', {'format': 'jpeg'})
+    try:
+        for size, cached_key in cached.get('derivatives', {}).items():
+            derivative_keys[size] = derivative_key(key, size, cached_key.rsplit('.', 1)[-1])
+            s3.copy_object(
+                Bucket=bucket,
+                Key=derivative_keys[size],
+                CopySource={'Bucket': bucket, 'Key': cached_key},
+                MetadataDirective='REPLACE',
+                Metadata={'processing-version': PROCESSING_VERSION},
+                ContentType=encoder.content_type(encoding['format'])
+            )
+    except Exception as e:
+        # Dérivés d’origine supprimés entre-temps : on retraite normalement
+        print(f"⚠️ Cache inutilisable pour {key} :", str(e))
+        emit_metric('AnalysisCacheMiss', 1)
+        return None
+
+    print(f"♻️ Analyse réutilisée pour {key} ({content_hash[:12]})")
+    emit_metric('AnalysisCacheHit', 1)
+    return {
+        'analysis': stored_analysis(cached),
+        'derivatives': derivative_keys,
+        'encoding': cached.get('encoding'),
+        'metadata': cached.get('metadata', {})
+    }
+
+def cache_analysis(content_hash, analysis, derivative_keys, encoding, metadata):
+    cache_table.put_item(Item={
+        'contentHash': content_hash,
+        **analysis,
+        'derivatives': derivative_keys,
+        'encoding': encoding,
+        'metadata': metadata,
+        'createdAt': datetime.utcnow().isoformat()
+    })
+
+def stored_analysis(item):
+    # Champs d’analyse d’une photo ou d’une entrée du cache ; les entrées antérieures
+    # aux analyseurs texte et modération n’ont que les étiquettes.
+    # Les attributs binaires (labelDetail) reviennent de DynamoDB en Binary
+    return {
+        field: item[field].value if isinstance(item[field], Binary) else item[field]
+        for fields in ANALYZER_FIELDS.values()
+        for field in fields
+        if field in item
+    }
+
+def emit_metric(name, value, unit='Count'):
+    metrics.emit({name: (value, unit)})
+
+def decode_image(source, size):
+    image = Image.open(source)
+    original_size = image.size
+
+    # EXIF lu sur l’en-tête déjà parsé, pendant le même décodage
+    try:
+        metadata = exif.read_exif(image)
+    except Exception as e:
+        print("⚠️ EXIF illisible :", str(e))
+        metadata = {'orientation': 1}
+    orientation = metadata.pop('orientation')
+
+    # La boîte englobante suit l’orientation : une photo portrait stockée couchée
+    # est réduite dans le sens de stockage puis redressée, sans rotation pleine taille
+    size = exif.oriented_size(size, orientation)
+
+    # JPEG : le décodeur réduit directement à 1/2, 1/4 ou 1/8 (draft mode),
+    # en gardant une marge x2 pour la qualité du redimensionnement final
+    image.draft('RGB', (size[0] * 2, size[1] * 2))
+
+    # Les palettes se redimensionnent mal (NEAREST) : conversion avant
+    if image.mode in ('1', 'P', 'PA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode == 'PA' else 'RGB')
+
+    # Redimensionner avant la conversion RGB : thumbnail utilise reduce() à la lecture
+    image.thumbnail(size)
+    image.load()  # thumbnail ne charge rien si l’image est déjà assez petite
+    image = exif.apply_orientation(image, orientation)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')  # ✅ Assure compatibilité JPEG
+
+    print(f"🖼️ Décodage {original_size[0]}x{original_size[1]} -> {image.size[0]}x{image.size[1]}")
+    return image, metadata
+
+def enhance(image):
+    # Un seul passage Image.point au lieu de deux images intermédiaires
+    # (ImageEnhance.Contrast puis ImageEnhance.Brightness)
+    curve = tone_curve(luma_mean(image))
+    return image.point(curve * len(image.getbands()))
+
+def luma_mean(image):
+    # Même calcul qu’ImageEnhance.Contrast : moyenne des niveaux de gris arrondis pixel
+    # par pixel par convert('L'). Pondérer les moyennes RGB arrondirait parfois autrement
+    return int(ImageStat.Stat(image.convert('L')).mean[0] + 0.5)
+
+def tone_curve(mean):
+    # Contraste autour de la luminance moyenne, puis luminosité, pour chaque niveau 0–255
+    return [blend(0, blend(mean, value, CONTRAST), BRIGHTNESS) for value in range(256)]
+
+def blend(base, value, alpha):
+    # Reproduit Image.blend en extrapolation : calcul en float32, bornes 0–255, troncature
+    result = float32(base + float32(float32(alpha) * (value - base)))
+    if result <= 0:
+        return 0
+    if result >= 255:
+        return 255
+    return int(result)
+
+def float32(value):
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+def reset_peak_memory():
+    # « 5 » dans clear_refs ramène VmHWM à la mémoire résidente actuelle (Linux ≥ 4.0).
+    # ru_maxrss, lui, ne redescend jamais : sur une instance chaude il garderait le pic
+    # de la plus grosse image déjà traitée
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_memory_mb():
+    # VmHWM (en Ko) : pic de mémoire résidente depuis la dernière remise à zéro
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+def call_rekognition(operation, deadline=None, **kwargs):
+    deadline = deadline or budget.Budget()
+    rekognition_bucket = rekognition_buckets[operation.__name__]
+    for attempt in range(1, REKOGNITION_MAX_ATTEMPTS + 1):
+        # L’attente d’admission ne dépasse jamais le budget de l’invocation
+        timeout = min(REKOGNITION_ADMISSION_TIMEOUT, deadline.remaining())
+        waited = rekognition_bucket.acquire(timeout=timeout)
+        emit_metric('RekognitionAdmissionWait', round(waited * 1000), 'Milliseconds')
+        try:
+            response = operation(**kwargs)
+            rekognition_bucket.on_success()
+            return response
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in REJECTED_IMAGE_ERRORS:
+                raise probe.Rejected(*REJECTED_IMAGE_ERRORS[code])
+            if code not in THROTTLING_ERRORS or attempt == REKOGNITION_MAX_ATTEMPTS:
+                raise
+            rekognition_bucket.on_throttle()
+            emit_metric('RekognitionThrottled', 1)
+            # Backoff exponentiel avec « full jitter » pour désynchroniser les threads
+            delay = random.uniform(0, min(5, 0.2 * 2 ** attempt))
+            if not deadline.affords(delay):
+                raise
+            time.sleep(delay)
+
+def upsert_photo(key, fields, remove=(), release=True):
+    # update_item et non put_item : les attributs posés ailleurs (isFavorite…) sont conservés.
+    # release : libère la réservation d’ingestion dans la même écriture
+    names = {'#uploadedAt': 'uploadedAt'}
+    values = {':uploadedAt': datetime.utcnow().isoformat()}
+    assignments = ['#uploadedAt = if_not_exists(#uploadedAt, :uploadedAt)']
+    for i, (name, value) in enumerate(fields.items()):
+        names[f'#f{i}'] = name
+        values[f':v{i}'] = value
+        assignments.append(f'#f{i} = :v{i}')
+    removals = ['ingestClaimedAt'] if release else []
+    for i, name in enumerate(remove):
+        names[f'#r{i}'] = name
+        removals.append(f'#r{i}')
+
+    # La photo complète en retour : propriétaire et date d’upload servent à l’index des étiquettes
+    return table.update_item(
+        Key={'photo': key},
+        UpdateExpression='SET ' + ', '.join(assignments) + (' REMOVE ' + ', '.join(removals) if removals else ''),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues='ALL_NEW'
+    )['Attributes']
+
 def default_cors():
     return {
         "Access-Control-Allow-Origin": "*",
@@ -0,0 +1,53 @@
+import threading
+import time
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Budget:
+    # Temps restant avant le timeout Lambda, moins une marge pour écrire le résultat
+    # et rendre la main proprement
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+
+    @classmethod
+    def from_context(cls, context, margin, limit=None):
+        # Sans contexte (sam local, scripts), aucune limite. limit : délai plus court
+        # imposé par l’appelant (API Gateway coupe avant le timeout Lambda)
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return cls()
+        remaining = context.get_remaining_time_in_millis() / 1000
+        if limit is not None:
+            remaining = min(remaining, limit)
+        return cls(time.monotonic() + remaining - margin)
+
+    def remaining(self):
+        if self.deadline is None:
+            return float('inf')
+        return max(0.0, self.deadline - time.monotonic())
+
+    def affords(self, seconds):
+        return seconds <= self.remaining()
+
+class CostModel:
+    # Coût mesuré de chaque étape (moyenne mobile exponentielle), partagé entre les
+    # invocations « chaudes ». Un coût est exprimé par unité : Mo téléchargé,
+    # mégapixel décodé, ou appel pour les étapes de durée fixe
+
+    def __init__(self, priors, smoothing=0.2):
+        self.costs = dict(priors)
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+
+    def estimate(self, stage, units=1):
+        with self.lock:
+            return self.costs[stage] * units
+
+    def record(self, stage, seconds, units=1):
+        if units <= 0:
+            return
+        with self.lock:
+            previous = self.costs[stage]
+            self.costs[stage] = previous + self.smoothing * (seconds / units - previous)
+
@@ -0,0 +1,139 @@
+import io
+import struct
+from PIL import Image, ImageMath
+
+# Référence : l’ancien encodage JPEG fixe. La cible perceptuelle est la similarité
+# structurelle (SSIM sur la luminance) qu’il atteint, moins une tolérance ;
+# la qualité retenue est la plus basse qui l’atteint
+BASELINE_QUALITY = 85
+SSIM_TOLERANCE = 0.002
+QUALITIES = list(range(40, 95, 5))
+# 7 et non 8 : des blocs alignés sur la grille DCT du JPEG masqueraient ses artefacts
+SSIM_BLOCK = 7
+
+# Segments JPEG conservés lors d’un passage tel quel : JFIF (APP0), profil ICC (APP2)
+# et Adobe (APP14, nécessaire au décodage des couleurs). EXIF, XMP, IPTC et
+# commentaires sont retirés, comme pour un ré-encodage
+KEPT_JPEG_SEGMENTS = (0xE0, 0xE2, 0xEE)
+JPEG_SOS = 0xDA
+
+FORMATS = {
+    'jpeg': {'format': 'JPEG', 'content_type': 'image/jpeg', 'options': {'progressive': True, 'optimize': True}},
+    'webp': {'format': 'WEBP', 'content_type': 'image/webp', 'options': {'method': 4}},
+    'avif': {'format': 'AVIF', 'content_type': 'image/avif', 'options': {'speed': 8}},
+}
+
+def available_formats():
+    # AVIF dépend de la version de Pillow (ou du plugin pillow-avif) présente dans le paquet
+    Image.init()
+    return [name for name, spec in FORMATS.items() if spec['format'] in Image.SAVE]
+
+def content_type(name):
+    return FORMATS[name]['content_type']
+
+def encode(image, name, quality):
+    # Aucune métadonnée (EXIF, ICC, XMP) n’est recopiée : Pillow n’écrit que ce qu’on lui passe
+    spec = FORMATS[name]
+    buffer = io.BytesIO()
+    image.save(buffer, format=spec['format'], quality=quality, **spec['options'])
+    return buffer.getvalue()
+
+def encode_baseline(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=BASELINE_QUALITY)
+    return buffer.getvalue()
+
+def encode_fixed(image, name, quality):
+    # Sans recherche : un seul encodage, sans mesure de similarité
+    data = encode(image, name, quality)
+    return {'format': name, 'quality': quality, 'data': data, 'ssim': None, 'baseline': data}
+
+def strip_jpeg_metadata(data):
+    # Copie sans perte : seuls les segments de métadonnées sont retirés, les données
+    # compressées (à partir de SOS) sont recopiées telles quelles
+    output = [data[:2]]
+    offset = 2
+    while offset + 4 <= len(data) and data[offset] == 0xFF:
+        marker = data[offset + 1]
+        if marker == JPEG_SOS:
+            break
+        length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        segment = data[offset:offset + 2 + length]
+        is_metadata = 0xE0 <= marker <= 0xEF or marker == 0xFE
+        if not is_metadata or marker in KEPT_JPEG_SEGMENTS:
+            output.append(segment)
+        offset += 2 + length
+    output.append(data[offset:])
+    return b''.join(output)
+
+def choose_encoding(image):
+    # Pour chaque format : recherche dichotomique de la plus basse qualité qui atteint
+    # la cible ; on garde ensuite le format le plus léger
+    reference = luma(image)
+    baseline = encode_baseline(image)
+    best = {
+        'format': 'jpeg',
+        'quality': BASELINE_QUALITY,
+        'data': baseline,
+        'ssim': similarity(reference, baseline)
+    }
+    target = best['ssim'] - SSIM_TOLERANCE
+
+    for name in available_formats():
+        candidate = search_quality(image, reference, name, target)
+        if candidate and len(candidate['data']) < len(best['data']):
+            best = candidate
+
+    best['baseline'] = baseline
+    return best
+
+def search_quality(image, reference, name, target):
+    low, high = 0, len(QUALITIES) - 1
+    found = None
+    while low <= high:
+        middle = (low + high) // 2
+        data = encode(image, name, QUALITIES[middle])
+        score = similarity(reference, data)
+        if score >= target:
+            found = {'format': name, 'quality': QUALITIES[middle], 'data': data, 'ssim': score}
+            high = middle - 1
+        else:
+            low = middle + 1
+    return found
+
+def luma(image):
+    return image.convert('L').convert('F')
+
+def similarity(reference, data):
+    # SSIM par blocs de SSIM_BLOCK x SSIM_BLOCK (7x7) sans chevauchement, moyennes locales obtenues par
+    # réduction BOX : tout reste dans Pillow, sans NumPy
+    with Image.open(io.BytesIO(data)) as decoded:
+        candidate = luma(decoded)
+
+    size = (max(1, reference.width // SSIM_BLOCK), max(1, reference.height // SSIM_BLOCK))
+
+    def local_mean(channel):
+        return channel.resize(size, Image.Resampling.BOX)
+
+    def product(a, b):
+        return ImageMath.lambda_eval(lambda args: args['a'] * args['b'], a=a, b=b)
+
+    mean_x = local_mean(reference)
+    mean_y = local_mean(candidate)
+    mean_xx = local_mean(product(reference, reference))
+    mean_yy = local_mean(product(candidate, candidate))
+    mean_xy = local_mean(product(reference, candidate))
+
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    ssim_map = ImageMath.lambda_eval(
+        lambda args: (
+            (2 * args['mx'] * args['my'] + c1)
+            * (2 * (args['mxy'] - args['mx'] * args['my']) + c2)
+        ) / (
+            (args['mx'] * args['mx'] + args['my'] * args['my'] + c1)
+            * ((args['mxx'] - args['mx'] * args['mx']) + (args['myy'] - args['my'] * args['my']) + c2)
+        ),
+        mx=mean_x, my=mean_y, mxx=mean_xx, myy=mean_yy, mxy=mean_xy
+    )
+    return ssim_map.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
@@ -0,0 +1,117 @@
+from decimal import Decimal
+from PIL import Image
+
+# Balises EXIF utiles (voir la spécification EXIF 2.3)
+ORIENTATION = 0x0112
+MAKE = 0x010F
+MODEL = 0x0110
+DATETIME = 0x0132
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+DATETIME_ORIGINAL = 0x9003
+OFFSET_TIME_ORIGINAL = 0x9011
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+
+# Orientation EXIF -> transposition qui redresse l’image (comme ImageOps.exif_transpose)
+TRANSPOSITIONS = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+# Orientations qui échangent largeur et hauteur
+QUARTER_TURNS = (5, 6, 7, 8)
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# 5 caractères ≈ cellules de 5 km : assez fin pour regrouper les photos par lieu
+GEOHASH_PRECISION = 5
+
+def read_exif(image):
+    # Lit l’en-tête déjà parsé par Image.open : aucun décodage de pixels
+    exif = image.getexif()
+    details = exif.get_ifd(EXIF_IFD)
+    gps = exif.get_ifd(GPS_IFD)
+
+    metadata = {'orientation': exif.get(ORIENTATION, 1)}
+
+    taken_at = parse_datetime(details.get(DATETIME_ORIGINAL) or exif.get(DATETIME))
+    if taken_at:
+        offset = details.get(OFFSET_TIME_ORIGINAL)
+        metadata['takenAt'] = taken_at + (clean(offset) or '')
+
+    latitude = parse_coordinate(gps.get(GPS_LATITUDE), gps.get(GPS_LATITUDE_REF), 'S')
+    longitude = parse_coordinate(gps.get(GPS_LONGITUDE), gps.get(GPS_LONGITUDE_REF), 'W')
+    if latitude is not None and longitude is not None:
+        metadata['latitude'] = Decimal(str(round(latitude, 6)))
+        metadata['longitude'] = Decimal(str(round(longitude, 6)))
+        metadata['geohash'] = geohash(latitude, longitude)
+
+    for name, tag in (('cameraMake', MAKE), ('cameraModel', MODEL)):
+        value = clean(exif.get(tag))
+        if value:
+            metadata[name] = value
+
+    return metadata
+
+def oriented_size(size, orientation):
+    # Boîte englobante à appliquer à l’image stockée pour respecter `size` une fois redressée
+    return (size[1], size[0]) if orientation in QUARTER_TURNS else size
+
+def apply_orientation(image, orientation):
+    transposition = TRANSPOSITIONS.get(orientation)
+    return image.transpose(transposition) if transposition is not None else image
+
+def parse_datetime(value):
+    # Format EXIF « AAAA:MM:JJ HH:MM:SS » -> ISO 8601
+    value = clean(value)
+    if not value or len(value) < 19 or value.startswith('0000'):
+        return None
+    date, _, time = value[:19].partition(' ')
+    return f"{date.replace(':', '-')}T{time}"
+
+def parse_coordinate(value, reference, negative_reference):
+    try:
+        degrees, minutes, seconds = (float(part) for part in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    if clean(reference) == negative_reference:
+        coordinate = -coordinate
+    return coordinate
+
+def geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    bounds = [[-90.0, 90.0], [-180.0, 180.0]]
+    result = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(result) < precision:
+        interval = bounds[1] if even else bounds[0]
+        value = longitude if even else latitude
+        middle = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            result.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(result)
+
+def clean(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'ignore')
+    if not isinstance(value, str):
+        return None
+    return value.strip('\x00 ').strip() or None
@@ -0,0 +1,62 @@
+import json
+import zlib
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+
+# Index inversé des étiquettes (table PhotoLabelIndex) : une entrée par (utilisateur, étiquette, photo).
+# Partition « userId#étiquette » en minuscules, tri « uploadedAt#photo » : une recherche
+# d’étiquette est une Query sur une seule partition, les plus récentes d’abord.
+# Le GSI photo-index retrouve les entrées d’une photo (ré-analyse, refus, suppression)
+PHOTO_INDEX = 'photo-index'
+# Confiance prêtée aux photos analysées avant labelDetail : seuls les noms à 80 % ou plus étaient gardés
+LEGACY_CONFIDENCE = 80
+
+def label_key(user_id, label):
+    return f"{user_id}#{label.strip().lower()}"
+
+def sort_key(uploaded_at, photo):
+    return f"{uploaded_at}#{photo}"
+
+def expand(labels, label_detail=None):
+    # {étiquette: confiance}. Les parents Rekognition reçoivent la meilleure confiance
+    # de leurs enfants : une recherche « Animal » retrouve une photo étiquetée « Dog »
+    if label_detail is None:
+        return {name: LEGACY_CONFIDENCE for name in labels}
+    confidences = {}
+    for name, confidence, parents, _, _ in json.loads(zlib.decompress(label_detail)):
+        for label in (name, *parents):
+            confidences[label] = max(confidence, confidences.get(label, 0))
+    return confidences
+
+def sync(table, photo, user_id, uploaded_at, confidences):
+    # Aligne les entrées de la photo sur `confidences` : celles d’une analyse précédente
+    # qui ne correspondent plus sont supprimées. Sans propriétaire, la photo n’est pas indexée
+    wanted = {}
+    if user_id and uploaded_at:
+        for label, confidence in confidences.items():
+            key = (label_key(user_id, label), sort_key(uploaded_at, photo))
+            wanted[key] = {
+                'labelKey': key[0],
+                'sortKey': key[1],
+                'photo': photo,
+                'label': label,
+                'confidence': Decimal(str(confidence))
+            }
+
+    stale = entries(table, photo) - wanted.keys()
+    with table.batch_writer() as batch:
+        for label_key_value, sort_key_value in stale:
+            batch.delete_item(Key={'labelKey': label_key_value, 'sortKey': sort_key_value})
+        for item in wanted.values():
+            batch.put_item(Item=item)
+    return len(wanted), len(stale)
+
+def entries(table, photo):
+    keys = set()
+    query = {'IndexName': PHOTO_INDEX, 'KeyConditionExpression': Key('photo').eq(photo)}
+    while True:
+        response = table.query(**query)
+        keys.update((item['labelKey'], item['sortKey']) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return keys
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,42 @@
+import json
+import time
+
+# CloudWatch Embedded Metric Format : une ligne JSON par enregistrement dans les logs,
+# CloudWatch en extrait les métriques sans appel PutMetricData
+NAMESPACE = 'PhotoApp/Ingest'
+
+def emit(values, dimensions=None, properties=None):
+    # values : {nom: (valeur, unité)} ; dimensions : {nom: valeur} ;
+    # properties : champs libres, visibles dans Logs Insights mais non agrégés
+    dimensions = dimensions or {}
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': NAMESPACE,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in values.items()]
+            }]
+        }
+    }
+    record.update(properties or {})
+    record.update(dimensions)
+    record.update({name: value for name, (value, _) in values.items()})
+    line = json.dumps(record, default=str)
+    print(line)
+    return line
+
+def parse(lines):
+    # Pour les scripts locaux : relit les enregistrements EMF parmi des lignes de log
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line.startswith('{'):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if '_aws' in record:
+            records.append(record)
+    return records
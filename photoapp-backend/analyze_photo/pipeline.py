@@ -0,0 +1,87 @@
+import time
+
+# Familles d’étapes : chaque étape en déclare une (pour regrouper les mesures)
+KINDS = ('fetch', 'decode', 'transform', 'encode', 'analyze', 'sink')
+
+class Stage:
+    # optional : peut être désactivée par configuration ou reportée faute de budget
+    # degradable : un échec saute les étapes dégradables restantes au lieu d’arrêter l’ingestion
+    # overlap : s’exécute en arrière-plan pendant les étapes suivantes, rejointe avant la prochaine écriture
+
+    def __init__(self, name, kind, run, optional=False, degradable=False, overlap=False):
+        if kind not in KINDS:
+            raise ValueError(f"Type d’étape inconnu : {kind}")
+        self.name = name
+        self.kind = kind
+        self.run = run
+        self.optional = optional
+        self.degradable = degradable
+        self.overlap = overlap
+
+class Pipeline:
+    def __init__(self, executor, on_stage=None):
+        self.executor = executor
+        self.on_stage = on_stage
+        self.stages = {}
+
+    def stage(self, name, kind, **options):
+        # Décorateur d’enregistrement : l’ordre d’exécution vient de la configuration
+        def register(run):
+            self.stages[name] = Stage(name, kind, run, **options)
+            return run
+        return register
+
+    def observe(self, callback):
+        # Décorateur : appelé après chaque étape réussie (durée, job)
+        self.on_stage = callback
+        return callback
+
+    def resolve(self, names, disabled=()):
+        for name in disabled:
+            if not self.stages[name].optional:
+                raise ValueError(f"L’étape {name} est obligatoire")
+        return [self.stages[name] for name in names if name not in disabled]
+
+    def run(self, stages, job):
+        # job : état partagé entre les étapes (dont l’unique image décodée, job['image'])
+        job.setdefault('skip', set())
+        job.setdefault('timings', [])
+        pending = []
+        for stage in stages:
+            if stage.name in job['skip']:
+                continue
+            if stage.overlap:
+                pending.append(self.executor.submit(self.execute, stage, job))
+                continue
+            if stage.kind == 'sink':
+                self.join(pending)
+            self.execute(stage, job)
+        self.join(pending)
+        return job
+
+    def join(self, pending):
+        while pending:
+            pending.pop(0).result()
+
+    def execute(self, stage, job):
+        started = time.monotonic()
+        try:
+            stats = stage.run(job) or {}
+        except Exception as e:
+            if not stage.degradable:
+                raise
+            print(f"❌ Étape {stage.name} en échec ({job['key']}):", str(e))
+            job.setdefault('failed', []).append(stage.name)
+            job['skip'].update(name for name, other in self.stages.items() if other.degradable)
+            return
+        elapsed = time.monotonic() - started
+
+        job['timings'].append({
+            'stage': stage.name,
+            'kind': stage.kind,
+            'ms': round(elapsed * 1000, 1),
+            'bytesIn': stats.get('bytes_in', 0),
+            'bytesOut': stats.get('bytes_out', 0)
+        })
+        if self.on_stage:
+            self.on_stage(stage, elapsed, job)
@@ -0,0 +1,70 @@
+import exif
+
+# Décisions possibles, de la moins coûteuse à la plus coûteuse
+PASS_THROUGH = 'passthrough'  # l’original (sans métadonnées) sert de dérivé medium
+RESIZE = 'resize'             # redimensionnement seul, ré-encodage à la qualité source
+FULL = 'full'                 # amélioration et recherche du meilleur encodage
+
+# Au-delà, le JPEG source est « trop riche » : le ré-encoder fait réellement gagner des octets
+MAX_SOURCE_QUALITY = 90
+# Densité maximale d’un JPEG servi tel quel (≈ 230 Ko pour 1024x768)
+MAX_BYTES_PER_PIXEL = 0.3
+PASS_THROUGH_MODES = ('RGB', 'L')
+
+# Table de quantification de luminance de référence (IJG, qualité 50), ordre naturel
+STANDARD_LUMINANCE = [
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+]
+
+def inspect(image):
+    # Lecture sur l’en-tête déjà parsé : tables de quantification, mode et orientation.
+    # Hors JPEG la décision est toujours FULL : pas de getexif(), qui décoderait
+    # tout un PNG pour trouver un éventuel bloc eXIf placé après les pixels
+    if image.format != 'JPEG':
+        return {'quality': None, 'mode': image.mode, 'orientation': 1}
+    quantization = getattr(image, 'quantization', None) or {}
+    return {
+        'quality': estimate_jpeg_quality(quantization.get(0)),
+        'mode': image.mode,
+        'orientation': image.getexif().get(exif.ORIENTATION, 1)
+    }
+
+def choose(header, source, target):
+    # Retourne (décision, raison)
+    if header['format'] != 'jpeg':
+        return FULL, f"source {header['format']}"
+    if source['quality'] is None:
+        return FULL, "qualité JPEG inconnue"
+    if source['quality'] > MAX_SOURCE_QUALITY:
+        return FULL, f"JPEG q{source['quality']}"
+
+    box = exif.oriented_size(target, source['orientation'])
+    fits = header['width'] <= box[0] and header['height'] <= box[1]
+    density = header['size'] / (header['width'] * header['height'])
+    if not fits:
+        return RESIZE, f"JPEG q{source['quality']} {header['width']}x{header['height']}"
+    if source['orientation'] != 1:
+        return RESIZE, f"orientation EXIF {source['orientation']}"
+    if source['mode'] not in PASS_THROUGH_MODES:
+        return RESIZE, f"mode {source['mode']}"
+    if density > MAX_BYTES_PER_PIXEL:
+        return RESIZE, f"{density:.2f} octet/pixel"
+    return PASS_THROUGH, f"JPEG q{source['quality']} déjà à la taille cible"
+
+def estimate_jpeg_quality(table):
+    # Inverse de la mise à l’échelle IJG : échelle = 5000/q (q < 50) ou 200 - 2q (q ≥ 50)
+    if not table or len(table) != len(STANDARD_LUMINANCE):
+        return None
+    scale = sum(value * 100 / reference for value, reference in zip(table, STANDARD_LUMINANCE)) / len(table)
+    if scale <= 100:
+        quality = (200 - scale) / 2
+    else:
+        quality = 5000 / scale
+    return max(1, min(100, round(quality)))
@@ -0,0 +1,149 @@
+import struct
+from botocore.exceptions import ClientError
+
+# Premiers octets lus avant tout téléchargement complet : suffisant pour l’en-tête
+# PNG/GIF/WebP et, dans la plupart des cas, pour atteindre le SOF d’un JPEG
+PROBE_BYTES = 64 * 1024
+# Lectures supplémentaires autorisées pour sauter de gros segments JPEG (EXIF, ICC…)
+MAX_EXTRA_READS = 3
+
+# Limites d’admission : au-delà, l’objet n’entre pas dans le pipeline
+MAX_OBJECT_BYTES = 50 * 1024 * 1024
+MAX_PIXELS = 100_000_000
+MIN_DIMENSION = 16
+
+# Segments JPEG porteurs des dimensions (SOF0 à SOF15 sauf DHT, JPG et DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Marqueurs sans champ de longueur
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xD8)) | {0x01}
+JPEG_SOS = 0xDA
+
+class Rejected(Exception):
+    # Refus définitif : inutile de réessayer, le contenu ne changera pas
+    def __init__(self, status_code, reason):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+
+def probe_object(s3, bucket, key):
+    # Lecture partielle (Range) : format, dimensions et taille totale sans télécharger l’objet
+    head, size, etag = read_range(s3, bucket, key, 0, PROBE_BYTES)
+
+    if size > MAX_OBJECT_BYTES:
+        raise Rejected(413, f"Fichier trop volumineux ({size // (1024 * 1024)} Mo, maximum {MAX_OBJECT_BYTES // (1024 * 1024)} Mo)")
+
+    image_format = detect_format(head)
+    if image_format is None:
+        raise Rejected(415, "Format non pris en charge (JPEG, PNG, WebP ou GIF attendu)")
+
+    try:
+        if image_format == 'jpeg':
+            width, height = jpeg_dimensions(s3, bucket, key, head, size, etag)
+        else:
+            width, height = HEADER_READERS[image_format](head)
+    except struct.error:
+        raise Rejected(422, "En-tête d’image tronqué")
+
+    if min(width, height) < MIN_DIMENSION:
+        raise Rejected(422, f"Image trop petite ({width}x{height})")
+    if width * height > MAX_PIXELS:
+        raise Rejected(413, f"Image trop grande ({width}x{height}, maximum {MAX_PIXELS // 1_000_000} Mpx)")
+
+    return {
+        'format': image_format,
+        'width': width,
+        'height': height,
+        'size': size,
+        'etag': etag,
+        'head': head
+    }
+
+def read_range(s3, bucket, key, start, length, etag=None):
+    options = {'IfMatch': etag} if etag else {}
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{start + length - 1}", **options)
+    except ClientError as e:
+        # Objet vide : aucune plage satisfaisable
+        if e.response['Error']['Code'] == 'InvalidRange':
+            raise Rejected(422, "Fichier vide")
+        raise
+
+    data = response['Body'].read()
+    # « bytes 0-65535/1234567 » : la taille totale suit la barre oblique
+    content_range = response.get('ContentRange')
+    size = int(content_range.rsplit('/', 1)[1]) if content_range else response['ContentLength']
+    return data, size, response.get('ETag')
+
+def detect_format(head):
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+def png_dimensions(head):
+    if head[12:16] != b'IHDR':
+        raise Rejected(422, "En-tête PNG invalide")
+    return struct.unpack('>II', head[16:24])
+
+def gif_dimensions(head):
+    return struct.unpack('<HH', head[6:10])
+
+def webp_dimensions(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and head[20:21] == b'\x2f':
+        bits = int.from_bytes(head[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+    raise Rejected(422, "En-tête WebP invalide")
+
+def jpeg_dimensions(s3, bucket, key, head, size, etag):
+    # Parcours des segments jusqu’au SOF ; un segment qui dépasse la fenêtre lue
+    # déclenche une nouvelle lecture partielle à partir du segment suivant
+    data = head
+    base = 0  # position de `data` dans l’objet
+    offset = 2
+    extra_reads = 0
+    while True:
+        position = offset - base
+        if position + 9 > len(data):
+            if base + len(data) >= size:
+                raise Rejected(422, "JPEG tronqué")
+            if extra_reads == MAX_EXTRA_READS:
+                raise Rejected(422, "En-tête JPEG introuvable")
+            extra_reads += 1
+            data, _, _ = read_range(s3, bucket, key, offset, PROBE_BYTES, etag)
+            base = offset
+            position = 0
+
+        if data[position] != 0xFF:
+            raise Rejected(422, "Segment JPEG invalide")
+        marker = data[position + 1]
+        if marker == 0xFF:
+            offset += 1  # octet de remplissage
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            offset += 2
+            continue
+        if marker == JPEG_SOS:
+            raise Rejected(422, "JPEG sans dimensions")
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[position + 5:position + 9])
+            return width, height
+
+        length = struct.unpack('>H', data[position + 2:position + 4])[0]
+        offset += 2 + length
+
+HEADER_READERS = {
+    'png': png_dimensions,
+    'gif': gif_dimensions,
+    'webp': webp_dimensions,
+}
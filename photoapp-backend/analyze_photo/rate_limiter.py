@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+class TokenBucket:
+    # Seau de jetons partagé par tous les threads d’une instance Lambda.
+    # Le débit s’adapte (AIMD) : divisé par deux à chaque throttling,
+    # puis remonte progressivement vers le débit nominal après chaque succès.
+
+    def __init__(self, rate, capacity=None, min_rate=0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, timeout=None):
+        # Bloque (file d’attente) au lieu d’échouer quand le budget est épuisé ;
+        # retourne le temps passé à attendre, en secondes
+        started = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - started
+                delay = (1 - self.tokens) / self.rate
+
+            if timeout is not None and now - started + delay > timeout:
+                raise AdmissionTimeout(f"Aucun jeton disponible après {timeout}s")
+            time.sleep(delay)
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
@@ -0,0 +1,83 @@
+import re
+import unicodedata
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+
+# Index plein texte par utilisateur (table PhotoSearchIndex) : une entrée par (utilisateur, terme, photo).
+# Termes « w:<mot> » (mot entier) et « t:<trigramme> » (recherche partielle et tolérante aux fautes),
+# en minuscules sans accents, sur la description, le lieu et les étiquettes.
+# Le GSI photo-index retrouve les entrées d’une photo (ré-analyse, refus, suppression).
+# La tokenisation est reprise à l’identique par la Lambda search
+PHOTO_INDEX = 'photo-index'
+# Poids d’un terme selon le champ où il apparaît (le meilleur l’emporte)
+FIELD_WEIGHTS = {
+    'labels': 1.0,
+    'location': 0.8,
+    'description': 0.6,
+}
+MIN_TOKEN_LENGTH = 2
+
+def fold(text):
+    # « Été à Paris » -> « ete a paris »
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def tokens(text):
+    return [token for token in re.findall(r'[a-z0-9]+', fold(text)) if len(token) >= MIN_TOKEN_LENGTH]
+
+def trigrams(token, partial=False):
+    # Bornes de mot marquées par des espaces : « pari » -> « pa », par, ari, « ri ».
+    # partial : mot en cours de saisie, sans borne de fin (« vacan » retrouve « vacances »)
+    padded = f" {token}" if partial else f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def postings(photo):
+    # {terme: poids} d’une photo de PhotoLabels. Photo refusée : rien à retrouver
+    if photo.get('rejected'):
+        return {}
+    fields = {
+        'labels': ' '.join(photo.get('labels', [])),
+        'location': photo.get('location') or '',
+        'description': photo.get('description') or '',
+    }
+    weights = {}
+    for field, text in fields.items():
+        for token in tokens(text):
+            for term in (f"w:{token}", *(f"t:{trigram}" for trigram in trigrams(token))):
+                weights[term] = max(FIELD_WEIGHTS[field], weights.get(term, 0))
+    return weights
+
+def term_key(user_id, term):
+    return f"{user_id}#{term}"
+
+def sync(table, photo, user_id, uploaded_at, weights):
+    # Aligne les entrées de la photo sur `weights`, comme label_index.sync
+    wanted = {}
+    if user_id:
+        for term, weight in weights.items():
+            key = (term_key(user_id, term), photo)
+            wanted[key] = {
+                'termKey': key[0],
+                'photo': photo,
+                'weight': Decimal(str(weight)),
+                # Départage des résultats de même score, sans relire les photos
+                'uploadedAt': uploaded_at or ''
+            }
+
+    stale = entries(table, photo) - wanted.keys()
+    with table.batch_writer() as batch:
+        for term_key_value, photo_key in stale:
+            batch.delete_item(Key={'termKey': term_key_value, 'photo': photo_key})
+        for item in wanted.values():
+            batch.put_item(Item=item)
+    return len(wanted), len(stale)
+
+def entries(table, photo):
+    keys = set()
+    query = {'IndexName': PHOTO_INDEX, 'KeyConditionExpression': Key('photo').eq(photo)}
+    while True:
+        response = table.query(**query)
+        keys.update((item['termKey'], item['photo']) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return keys
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
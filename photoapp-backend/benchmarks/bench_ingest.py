@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Micro-benchmark du chemin de traitement d’analyze_photo (sondage, décodage,
+# amélioration, encodage, upload, Rekognition) sur un corpus généré.
+#
+#   python benchmarks/bench_ingest.py                      # tout le corpus, 3 passes
+#   python benchmarks/bench_ingest.py --only jpeg-12mp --repeat 10
+#   python benchmarks/bench_ingest.py --compare benchmarks/results/<fichier>.json
+#
+# S3 et Rekognition sont remplacés par des équivalents en mémoire (standins.py) ;
+# les étapes DynamoDB (lookup, remember, record, index, commit) ne sont pas exécutées.
+# Chaque fixture tourne dans un processus neuf : le pic RSS mesuré est le sien.
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ANALYZE_PHOTO = os.path.join(os.path.dirname(HERE), 'analyze_photo')
+sys.path.insert(0, HERE)
+
+import corpus
+
+# Chemin de traitement mesuré : le pipeline d’ingestion sans ses étapes DynamoDB
+BENCH_PIPELINE = ['probe', 'plan', 'download', 'policy', 'decode', 'enhance', 'encode', 'upload', 'analyze']
+BUCKET = 'bench'
+PERCENTILES = (50, 90, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline d’ingestion photo")
+    parser.add_argument('--only', nargs='+', choices=list(corpus.FIXTURES), help="fixtures à mesurer")
+    parser.add_argument('--repeat', type=int, default=3, help="passes mesurées par fixture")
+    parser.add_argument('--warmup', type=int, default=1, help="passes non mesurées avant la mesure")
+    parser.add_argument('--rekognition-latency', type=float, default=0, help="latence simulée de Rekognition (ms)")
+    parser.add_argument('--corpus', default=os.path.join(HERE, '.corpus'), help="dossier du corpus généré")
+    parser.add_argument('--output', default=os.path.join(HERE, 'results'), help="dossier des résultats JSON")
+    parser.add_argument('--compare', help="résultats d’un run précédent à comparer")
+    args = parser.parse_args()
+
+    print("🧪 Génération du corpus…")
+    paths = corpus.build(args.corpus, args.only)
+
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for name, path in paths.items():
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(measure, (name, path, args.repeat, args.warmup, args.rekognition_latency / 1000))
+        print_fixture(name, results[name])
+
+    run = {
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'createdAt': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'pillow': pillow_version(),
+        'repeat': args.repeat,
+        'rekognitionLatencyMs': args.rekognition_latency,
+        'fixtures': results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    output = os.path.join(args.output, f"{run['createdAt'][:19].replace(':', '')}-{run['commit'] or 'local'}.json")
+    with open(output, 'w') as handle:
+        json.dump(run, handle, indent=2)
+    print(f"💾 Résultats : {output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(json.load(handle), run)
+
+def measure(name, path, repeat, warmup, latency):
+    # Exécuté dans un processus fils : import d’app.py avec les remplaçants locaux
+    os.environ.update({
+        'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'eu-west-1'),
+        'TABLE_NAME': 'bench', 'CACHE_TABLE': 'bench', 'JOBS_TABLE': 'bench',
+        'LABEL_INDEX_TABLE': 'bench', 'SEARCH_INDEX_TABLE': 'bench',
+        'BUCKET_NAME': BUCKET,
+        # Pas de limitation de débit : on mesure le traitement, pas le seau de jetons
+        'REKOGNITION_TPS': '100000',
+    })
+    sys.path.insert(0, ANALYZE_PHOTO)
+    import app
+    import metrics
+    from standins import LocalRekognition, LocalS3
+
+    app.s3 = LocalS3()
+    app.rekognition = LocalRekognition(latency)
+    with open(path, 'rb') as handle:
+        data = handle.read()
+
+    wall = []
+    stages = {}
+    summaries = []
+    for run in range(warmup + repeat):
+        key = f"photo/{name}-{run}{os.path.splitext(path)[1]}"
+        app.s3.put_object(Bucket=BUCKET, Key=key, Body=data)
+        job = {'bucket': BUCKET, 'key': key, 'deadline': app.budget.Budget(), 'fields': {}}
+
+        logs = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(logs):
+            app.run_pipeline(job, BENCH_PIPELINE)
+        elapsed = time.perf_counter() - started
+        if run < warmup:
+            continue
+
+        wall.append(elapsed * 1000)
+        for record in metrics.parse(logs.getvalue().splitlines()):
+            if 'Stage' in record:
+                stages.setdefault(record['Stage'], []).append(record['StageDuration'])
+            elif 'IngestDuration' in record:
+                summaries.append(record)
+
+    last = summaries[-1]
+    return {
+        'images': repeat,
+        'sourceBytes': last['SourceBytes'],
+        'sourcePixels': last['SourcePixels'],
+        'outputBytes': last['OutputBytes'],
+        'outputPixels': last['OutputPixels'],
+        'policy': last.get('policy'),
+        'throughput': round(repeat / (sum(wall) / 1000), 3),
+        'latencyMs': percentiles(wall),
+        'stagesMs': {stage: percentiles(values) for stage, values in stages.items()},
+        'peakRssMb': peak_rss_mb(),
+    }
+
+def peak_rss_mb():
+    # VmHWM repart de zéro à l’exec du processus fils, contrairement à ru_maxrss
+    # qui hérite du pic du parent (génération du corpus)
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss : Ko sous Linux, octets sous macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+def percentiles(values):
+    ordered = sorted(values)
+    result = {}
+    for percentile in PERCENTILES:
+        # Rang le plus proche : pas d’interpolation sur de petits échantillons
+        rank = max(1, -(-percentile * len(ordered) // 100))
+        result[f"p{percentile}"] = round(ordered[rank - 1], 1)
+    return result
+
+def print_fixture(name, result):
+    stages = ', '.join(
+        f"{stage} {timing['p50']:.0f}"
+        for stage, timing in sorted(result['stagesMs'].items(), key=lambda item: -item[1]['p50'])
+    )
+    print(
+        f"📊 {name:<17} {result['throughput']:>7.2f} img/s  "
+        f"p50 {result['latencyMs']['p50']:>7.0f} ms  p99 {result['latencyMs']['p99']:>7.0f} ms  "
+        f"RSS {result['peakRssMb']:>6.0f} Mo  {result['sourceBytes'] // 1024} -> {result['outputBytes'] // 1024} Ko "
+        f"({result['policy']})"
+    )
+    print(f"   étapes p50 (ms) : {stages}")
+
+def compare(before, after):
+    print(f"🔁 {before['commit']} -> {after['commit']}")
+    for name, result in after['fixtures'].items():
+        previous = before['fixtures'].get(name)
+        if not previous:
+            continue
+        print(
+            f"   {name:<17} p50 {delta(previous['latencyMs']['p50'], result['latencyMs']['p50'])}  "
+            f"débit {delta(previous['throughput'], result['throughput'])}  "
+            f"RSS {delta(previous['peakRssMb'], result['peakRssMb'])}  "
+            f"octets {delta(previous['outputBytes'], result['outputBytes'])}"
+        )
+
+def delta(before, after):
+    if not before:
+        return f"{after}"
+    return f"{before} -> {after} ({(after - before) * 100 / before:+.1f} %)"
+
+def git(*arguments):
+    try:
+        return subprocess.run(['git', *arguments], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def pillow_version():
+    import PIL
+    return PIL.__version__
+
+if __name__ == '__main__':
+    main()
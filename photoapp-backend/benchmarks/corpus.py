@@ -0,0 +1,68 @@
+import io
+import os
+import random
+from PIL import Image, ImageDraw, ImageFilter
+
+# Corpus synthétique mais réaliste pour l’encodeur : dégradés, formes et bruit fin,
+# ce qui donne des tailles de fichiers proches de vraies photos (un aplat se compresserait trop bien)
+FIXTURES = {
+    # nom : (largeur, hauteur, format, options)
+    'small-jpeg': (1024, 768, 'JPEG', {'quality': 80}),
+    'jpeg-12mp': (4000, 3000, 'JPEG', {'quality': 92}),
+    'jpeg-48mp': (8000, 6000, 'JPEG', {'quality': 92}),
+    'progressive-12mp': (4000, 3000, 'JPEG', {'quality': 90, 'progressive': True}),
+    'png-alpha': (2000, 1500, 'PNG', {'alpha': True}),
+    'panorama-50mp': (20000, 2500, 'JPEG', {'quality': 88}),
+    'rotated-12mp': (4000, 3000, 'JPEG', {'quality': 85, 'orientation': 6}),
+}
+
+def build(directory, names=None, seed=42):
+    # Génère (une seule fois) les fichiers du corpus ; retourne {nom: chemin}
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for name in names or FIXTURES:
+        width, height, image_format, options = FIXTURES[name]
+        extension = 'png' if image_format == 'PNG' else 'jpg'
+        path = os.path.join(directory, f"{name}.{extension}")
+        if not os.path.exists(path):
+            with open(path, 'wb') as output:
+                output.write(render(width, height, image_format, options, seed))
+        paths[name] = path
+    return paths
+
+def render(width, height, image_format, options, seed):
+    image = scene(width, height, seed)
+    if options.get('alpha'):
+        # Masque elliptique adouci : vraie transparence partielle
+        mask = Image.new('L', image.size, 0)
+        ImageDraw.Draw(mask).ellipse((width // 10, height // 10, width * 9 // 10, height * 9 // 10), fill=255)
+        image.putalpha(mask.filter(ImageFilter.GaussianBlur(max(1, width // 100))))
+
+    save_options = {key: value for key, value in options.items() if key in ('quality', 'progressive')}
+    if 'orientation' in options:
+        exif = Image.Exif()
+        exif[0x0112] = options['orientation']
+        save_options['exif'] = exif
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **save_options)
+    return buffer.getvalue()
+
+def scene(width, height, seed):
+    # Construit en basse résolution puis agrandi : rapide même pour 50 Mpx
+    rng = random.Random(seed)
+    small = (max(1, width // 8), max(1, height // 8))
+    base = Image.linear_gradient('L').resize(small).convert('RGB')
+    tint = Image.new('RGB', small, tuple(rng.randrange(60, 200) for _ in range(3)))
+    base = Image.blend(base, tint, 0.5)
+
+    draw = ImageDraw.Draw(base)
+    for _ in range(40):
+        x, y = rng.randrange(small[0]), rng.randrange(small[1])
+        radius = rng.randrange(2, max(3, min(small) // 4))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+
+    image = base.resize((width, height), Image.Resampling.BILINEAR)
+    noise = Image.effect_noise((width, height), 24).convert('RGB')
+    return Image.blend(image, noise, 0.12)
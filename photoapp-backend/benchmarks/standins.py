@@ -0,0 +1,111 @@
+import hashlib
+import io
+import time
+from botocore.exceptions import ClientError
+
+# Remplaçants en mémoire de S3 et Rekognition : seules les opérations utilisées par
+# le chemin de traitement d’analyze_photo sont implémentées, sans réseau ni moto
+
+class Body:
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.stream.read(size)
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self.stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+class LocalS3:
+    def __init__(self):
+        self.objects = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, Metadata=None, **options):
+        data = bytes(Body)
+        self.objects[(Bucket, Key)] = {
+            'data': data,
+            'ContentType': ContentType or 'binary/octet-stream',
+            'Metadata': Metadata or {},
+            'ETag': '"' + hashlib.md5(data).hexdigest() + '"'
+        }
+        self.bytes_written += len(data)
+        return {'ETag': self.objects[(Bucket, Key)]['ETag']}
+
+    def head_object(self, Bucket, Key):
+        stored = self.lookup(Bucket, Key)
+        return {'ContentLength': len(stored['data']), 'ETag': stored['ETag'], 'Metadata': stored['Metadata']}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        stored = self.lookup(Bucket, Key)
+        if IfMatch and IfMatch != stored['ETag']:
+            raise error('PreconditionFailed', 'GetObject')
+        data = stored['data']
+        response = {'ETag': stored['ETag'], 'Metadata': stored['Metadata']}
+        if Range:
+            start, _, end = Range.removeprefix('bytes=').partition('-')
+            start = int(start)
+            if start >= len(data):
+                raise error('InvalidRange', 'GetObject')
+            end = min(int(end), len(data) - 1) if end else len(data) - 1
+            response['ContentRange'] = f"bytes {start}-{end}/{len(data)}"
+            data = data[start:end + 1]
+        response['ContentLength'] = len(data)
+        response['Body'] = Body(data)
+        self.bytes_read += len(data)
+        return response
+
+    def copy_object(self, Bucket, Key, CopySource, **options):
+        stored = self.lookup(CopySource['Bucket'], CopySource['Key'])
+        return self.put_object(Bucket, Key, stored['data'], options.get('ContentType'), options.get('Metadata'))
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def lookup(self, bucket, key):
+        if (bucket, key) not in self.objects:
+            raise error('NoSuchKey', 'GetObject')
+        return self.objects[(bucket, key)]
+
+class LocalRekognition:
+    # Latence simulée optionnelle, pour mesurer le recouvrement upload / analyse
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def detect_labels(self, Image, MaxLabels=10, MinConfidence=80, **options):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        labels = [
+            {'Name': 'Landscape', 'Confidence': 97.1, 'Parents': [], 'Instances': []},
+            {'Name': 'Nature', 'Confidence': 95.4, 'Parents': [], 'Instances': []},
+            {'Name': 'Outdoors', 'Confidence': 90.2, 'Parents': [], 'Instances': []},
+        ]
+        return {'Labels': labels[:MaxLabels]}
+
+    def detect_text(self, Image, **options):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {'TextDetections': [
+            {'DetectedText': 'PHOTO APP', 'Type': 'LINE', 'Confidence': 98.3, 'Id': 0},
+            {'DetectedText': 'PHOTO', 'Type': 'WORD', 'Confidence': 98.6, 'Id': 1, 'ParentId': 0},
+            {'DetectedText': 'APP', 'Type': 'WORD', 'Confidence': 98.0, 'Id': 2, 'ParentId': 0},
+        ]}
+
+    def detect_moderation_labels(self, Image, MinConfidence=50, **options):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {'ModerationLabels': []}
+
+def error(code, operation):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
@@ -2,6 +2,7 @@ import json
 import boto3
 import uuid
 import os
+from datetime import datetime
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['ALBUMS_TABLE'])
@@ -22,7 +23,9 @@ def lambda_handler(event, context):
         item = {
             "albumId": album_id,
             "userId": user_id,
-            "name": album_name
+            "name": album_name,
+            # Clé de tri de l'index userId-createdAt (listAlbums, plus récents d'abord)
+            "createdAt": datetime.utcnow().isoformat()
         }
 
         table.put_item(Item=item)
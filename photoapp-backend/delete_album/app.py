@@ -1,15 +1,33 @@
 import json
 import boto3
 import os
+from boto3.dynamodb.conditions import Key
 
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get("ALBUMS_TABLE")
 table = dynamodb.Table(table_name)
+photos_table = dynamodb.Table(os.environ["PHOTO_LABELS_TABLE"])
+# GSI créé par scripts/ensure_indexes.py (photos d'un album)
+ALBUM_INDEX = "albumId-uploadedAt"
 
 def lambda_handler(event, context):
     album_id = event["pathParameters"]["albumId"]
     
     try:
+        # Vérifié ici et non dans le client, qui ne connaît que les pages déjà chargées :
+        # une seule photo suffit pour refuser
+        photos = photos_table.query(
+            IndexName=ALBUM_INDEX,
+            KeyConditionExpression=Key("albumId").eq(album_id),
+            Limit=1
+        )
+        if photos.get("Items"):
+            return {
+                "statusCode": 409,
+                "headers": {"Access-Control-Allow-Origin": "*"},
+                "body": json.dumps({"message": "Impossible de supprimer un album contenant des photos."})
+            }
+
         table.delete_item(Key={"albumId": album_id})
         return {
             "statusCode": 200,
@@ -1,10 +1,15 @@
 import boto3
 import os
 import json
+from boto3.dynamodb.conditions import Key
 
 s3 = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['TABLE_NAME'])
+# Index inversé des étiquettes (voir analyze_photo/label_index.py)
+label_index_table = dynamodb.Table(os.environ['LABEL_INDEX_TABLE'])
+# Index plein texte de GET /search (voir analyze_photo/search_index.py)
+search_index_table = dynamodb.Table(os.environ['SEARCH_INDEX_TABLE'])
 
 def lambda_handler(event, context):
     try:
@@ -16,10 +21,18 @@ def lambda_handler(event, context):
         if not photo_key:
             return response(400, {"message": "❌ Clé 'photo' manquante dans le corps de la requête."})
 
-        # 🔥 Supprimer le fichier dans S3
+        # 🔥 Supprimer le fichier dans S3 (original + dérivés thumb/medium)
         bucket_name = os.environ['BUCKET_NAME']
-        s3.delete_object(Bucket=bucket_name, Key=photo_key)
-        print(f"🗑️ Fichier S3 supprimé: {photo_key}")
+        item = table.get_item(Key={"photo": photo_key}).get("Item", {})
+        for key in [photo_key, *item.get("derivatives", {}).values()]:
+            s3.delete_object(Bucket=bucket_name, Key=key)
+            print(f"🗑️ Fichier S3 supprimé: {key}")
+
+        # 🏷️ Retirer la photo de l'index des étiquettes et de l'index de recherche
+        removed = delete_index_entries(label_index_table, ("labelKey", "sortKey"), photo_key)
+        print(f"🏷️ Entrées d'index supprimées: {removed}")
+        removed = delete_index_entries(search_index_table, ("termKey", "photo"), photo_key)
+        print(f"🔎 Termes de recherche supprimés: {removed}")
 
         # 🧹 Supprimer l'entrée DynamoDB
         table.delete_item(Key={"photo": photo_key})
@@ -31,6 +44,20 @@ def lambda_handler(event, context):
         print("⚠️ Erreur pendant la suppression:", str(e))
         return response(500, {"message": f"Erreur : {str(e)}"})
 
+def delete_index_entries(index_table, key_names, photo_key):
+    # Entrées d'une photo retrouvées par le GSI photo-index des deux tables d'index
+    removed = 0
+    query = {"IndexName": "photo-index", "KeyConditionExpression": Key("photo").eq(photo_key)}
+    with index_table.batch_writer() as batch:
+        while True:
+            page = index_table.query(**query)
+            for entry in page.get("Items", []):
+                batch.delete_item(Key={name: entry[name] for name in key_names})
+                removed += 1
+            if "LastEvaluatedKey" not in page:
+                return removed
+            query["ExclusiveStartKey"] = page["LastEvaluatedKey"]
+
 def response(status, body):
     return {
         "statusCode": status,
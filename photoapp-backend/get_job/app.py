@@ -0,0 +1,57 @@
+import boto3
+import os
+import json
+
+dynamodb = boto3.resource('dynamodb')
+jobs_table = dynamodb.Table(os.environ['JOBS_TABLE'])
+photos_table = dynamodb.Table(os.environ['TABLE_NAME'])
+
+def lambda_handler(event, context):
+    try:
+        claims = event.get("requestContext", {}).get("authorizer", {}).get("claims", {})
+        user_id = claims.get("sub")
+        if not user_id:
+            raise Exception("Utilisateur non authentifié")
+
+        job_id = (event.get("pathParameters") or {}).get("id")
+        if not job_id:
+            return respond(400, {"message": "Identifiant de job requis."})
+
+        job = jobs_table.get_item(Key={"jobId": job_id}).get("Item")
+        if not job or job.get("userId") != user_id:
+            return respond(404, {"message": "Job introuvable."})
+
+        result = {
+            "jobId": job_id,
+            "photo": job["photo"],
+            "status": job["status"],
+            "labels": job.get("labels", []),
+            "createdAt": job.get("createdAt"),
+            "updatedAt": job.get("updatedAt")
+        }
+        if job.get("error"):
+            result["error"] = job["error"]
+
+        # L'analyse a pu être faite par l'ingestion S3 : la photo fait foi
+        if result["status"] in ("queued", "running"):
+            photo = photos_table.get_item(Key={"photo": job["photo"]}).get("Item", {})
+            if "processingVersion" in photo:
+                result["status"] = "succeeded"
+                result["labels"] = photo.get("labels", [])
+
+        return respond(200, result)
+
+    except Exception as e:
+        print("❌ Erreur get_job:", str(e))
+        return respond(500, {"error": str(e)})
+
+def respond(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Content-Type,Authorization",
+            "Access-Control-Allow-Methods": "GET,OPTIONS"
+        },
+        "body": json.dumps(body)
+    }
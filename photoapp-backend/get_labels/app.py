@@ -1,11 +1,17 @@
 import boto3
 import os
 import json
+import zlib
+from decimal import Decimal
 
 # Initialiser DynamoDB
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['TABLE_NAME'])
 
+# Seuils par défaut : ceux appliqués avant que la réponse complète de Rekognition soit conservée
+DEFAULT_MIN_CONFIDENCE = 80
+DEFAULT_MAX_LABELS = 10
+
 def lambda_handler(event, context):
     print("🔍 Event reçu :", json.dumps(event))
 
@@ -20,6 +26,18 @@ def lambda_handler(event, context):
             'body': json.dumps({'message': 'Le paramètre "photo" est requis.'})
         }
 
+    # Seuils choisis à la lecture : ?minConfidence=60&maxLabels=20&detail=true
+    try:
+        min_confidence = float(params.get('minConfidence', DEFAULT_MIN_CONFIDENCE))
+        max_labels = int(params.get('maxLabels', DEFAULT_MAX_LABELS))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': cors_headers(),
+            'body': json.dumps({'message': 'minConfidence et maxLabels doivent être numériques.'})
+        }
+    detail = params.get('detail') == 'true'
+
     try:
         # Lecture dans DynamoDB avec clé primaire "photo"
         response = table.get_item(Key={'photo': photo_key})
@@ -31,10 +49,17 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': 'Photo non trouvée.'})
             }
 
+        item = response['Item']
+        labels = select_labels(item, min_confidence, max_labels)
+        item['labels'] = [label['name'] for label in labels]
+        item.pop('labelDetail', None)
+        if detail:
+            item['labelDetail'] = labels
+
         return {
             'statusCode': 200,
             'headers': cors_headers(),
-            'body': json.dumps(response['Item'])  # ✅ retourne l'objet complet (clé + labels)
+            'body': json.dumps(item, default=decimal_default)  # ✅ retourne l'objet complet (clé + labels)
         }
 
     except Exception as e:
@@ -45,6 +70,25 @@ def lambda_handler(event, context):
             'body': json.dumps({'message': f"Erreur interne : {str(e)}"})
         }
 
+def select_labels(item, min_confidence, max_labels):
+    # labelDetail : JSON compressé de lignes [nom, confiance, parents, catégories, instances]
+    # par confiance décroissante (voir analyze_photo)
+    if 'labelDetail' not in item:
+        # Photo analysée avant labelDetail : seuls les noms au-dessus de 80 % sont connus
+        return [{'name': name} for name in item.get('labels', [])[:max_labels]]
+    rows = json.loads(zlib.decompress(item['labelDetail'].value))
+    return [
+        {'name': name, 'confidence': confidence, 'parents': parents, 'categories': categories, 'instances': instances}
+        for name, confidence, parents, categories, instances in rows
+        if confidence >= min_confidence
+    ][:max_labels]
+
+# DynamoDB renvoie les nombres (tailles, SSIM…) en Decimal
+def decimal_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
 # Fonction pour les headers CORS
 def cors_headers():
     return {
@@ -1,10 +1,20 @@
 import boto3
 import os
 import json
-from boto3.dynamodb.conditions import Attr
+import base64
+import hashlib
+import hmac
+from boto3.dynamodb.conditions import Key
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['ALBUMS_TABLE'])
+# GSI créé par scripts/ensure_indexes.py, trié par date de création
+USER_INDEX = "userId-createdAt"
+# Clé HMAC des jetons de pagination (secret généré par la stack)
+pagination_secret = os.environ['PAGINATION_SECRET'].encode()
+# Taille de page : ?limit=…, bornée pour garder des réponses rapides
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
 
 def lambda_handler(event, context):
     try:
@@ -14,31 +24,66 @@ def lambda_handler(event, context):
         if not user_id:
             raise Exception("Utilisateur non authentifié")
 
-        # ⚠️ Utiliser Attr car pas d’index GSI
-        response = table.scan(
-            FilterExpression=Attr("userId").eq(user_id)
-        )
+        params = event.get("queryStringParameters") or {}
+        try:
+            limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return respond(400, {"error": "limit doit être numérique."})
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return respond(400, {"error": f"limit doit être compris entre 1 et {MAX_PAGE_SIZE}."})
 
+        # Query sur l'index du propriétaire : seuls ses albums sont lus, les plus récents d'abord
+        query = {
+            "IndexName": USER_INDEX,
+            "KeyConditionExpression": Key("userId").eq(user_id),
+            "ScanIndexForward": False,
+            "Limit": limit
+        }
+        if params.get("nextToken"):
+            try:
+                query["ExclusiveStartKey"] = decode_token(params["nextToken"], user_id)
+            except ValueError:
+                return respond(400, {"error": "nextToken invalide."})
+
+        response = table.query(**query)
         albums = response.get("Items", [])
+        last_key = response.get("LastEvaluatedKey")
 
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "Content-Type,Authorization",
-                "Access-Control-Allow-Methods": "GET,OPTIONS"
-            },
-            "body": json.dumps({ "albums": albums })
-        }
+        return respond(200, {
+            "albums": albums,
+            "count": len(albums),
+            # Absent (null) sur la dernière page
+            "nextToken": encode_token(last_key, user_id) if last_key else None
+        })
 
     except Exception as e:
         print("❌ Erreur ListAlbums:", str(e))
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "Content-Type,Authorization",
-                "Access-Control-Allow-Methods": "GET,OPTIONS"
-            },
-            "body": json.dumps({ "error": str(e) })
-        }
+        return respond(500, {"error": str(e)})
+
+def respond(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Content-Type,Authorization",
+            "Access-Control-Allow-Methods": "GET,OPTIONS"
+        },
+        "body": json.dumps(body)
+    }
+
+def encode_token(last_key, scope):
+    # Jeton opaque : clé DynamoDB + propriétaire, signés HMAC-SHA256.
+    # Un jeton modifié ou pris sur la liste d'un autre utilisateur est refusé
+    payload = base64.urlsafe_b64encode(json.dumps({"k": last_key, "s": scope}).encode()).rstrip(b"=")
+    signature = base64.urlsafe_b64encode(hmac.new(pagination_secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+    return (payload + b"." + signature).decode()
+
+def decode_token(token, scope):
+    payload, _, signature = token.encode().partition(b".")
+    expected = base64.urlsafe_b64encode(hmac.new(pagination_secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+    if not hmac.compare_digest(signature, expected):
+        raise ValueError("signature invalide")
+    data = json.loads(base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4)))
+    if data.get("s") != scope:
+        raise ValueError("jeton d'une autre liste")
+    return data["k"]
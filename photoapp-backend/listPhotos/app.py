@@ -1,12 +1,39 @@
 import boto3
 import os
 import json
-from boto3.dynamodb.conditions import Attr
+import zlib
+import base64
+import hashlib
+import hmac
+import heapq
+from decimal import Decimal
+from boto3.dynamodb.conditions import Attr, Key
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['PHOTO_LABELS_TABLE'])
+# Index inversé (utilisateur, étiquette, photo) écrit par analyze_photo (voir label_index.py)
+label_index_table = dynamodb.Table(os.environ['LABEL_INDEX_TABLE'])
 s3 = boto3.client('s3')
 bucket_name = os.environ['BUCKET_NAME']
+# Clé HMAC des jetons de pagination (secret généré par la stack)
+pagination_secret = os.environ['PAGINATION_SECRET'].encode()
+
+# GSI créés par scripts/ensure_indexes.py, triés par date d'upload
+USER_INDEX = "userId-uploadedAt"
+ALBUM_INDEX = "albumId-uploadedAt"
+# Index creux : seules les photos ayant favoritedAt (voir toggle_favorite) y figurent
+FAVORITE_INDEX = "userId-favoritedAt"
+
+# Seuils par défaut des étiquettes, surchargeables par requête (?minConfidence=60&maxLabels=20)
+DEFAULT_MIN_CONFIDENCE = 80
+DEFAULT_MAX_LABELS = 10
+# Taille de page : ?limit=…, bornée pour garder des réponses rapides
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Étiquettes combinables dans une recherche (?label=dog,beach&match=all|any)
+MAX_SEARCH_LABELS = 5
+# BatchGetItem : 100 clés par appel
+BATCH_GET_SIZE = 100
 
 def lambda_handler(event, context):
     try:
@@ -19,59 +46,250 @@ def lambda_handler(event, context):
         # Récupération de l'albumId s’il est dans l’URL
         params = event.get('queryStringParameters') or {}
         album_id = params.get('albumId')
+        favorite = params.get('favorite') == 'true'
+        try:
+            min_confidence = float(params.get('minConfidence', DEFAULT_MIN_CONFIDENCE))
+            max_labels = int(params.get('maxLabels', DEFAULT_MAX_LABELS))
+            limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return respond(400, {"error": "minConfidence, maxLabels et limit doivent être numériques."})
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return respond(400, {"error": f"limit doit être compris entre 1 et {MAX_PAGE_SIZE}."})
+
+        labels = list(dict.fromkeys(label.strip().lower() for label in params.get("label", "").split(",") if label.strip()))
+        if labels:
+            # Recherche par étiquette : ET (match=all, défaut) ou OU (match=any)
+            match = params.get("match", "all")
+            if match not in ("all", "any"):
+                return respond(400, {"error": "match doit valoir all ou any."})
+            if len(labels) > MAX_SEARCH_LABELS:
+                return respond(400, {"error": f"{MAX_SEARCH_LABELS} étiquettes au plus."})
+            if album_id or favorite:
+                return respond(400, {"error": "label ne se combine pas avec albumId ou favorite."})
+
+            scope = f"{user_id}:label:{match}:{min_confidence}:{','.join(sorted(labels))}"
+            cursor = None
+            if params.get("nextToken"):
+                try:
+                    cursor = decode_token(params["nextToken"], scope)
+                except ValueError:
+                    return respond(400, {"error": "nextToken invalide."})
+            items, cursor = search_labels(user_id, labels, match == "all", min_confidence, limit, cursor)
+            next_token = encode_token(cursor, scope) if cursor else None
+        else:
+            # Query sur l'index du propriétaire (ou de l'album, ou des favoris) : seules ses photos
+            # sont lues, quelle que soit la taille de la table. Les plus récentes d'abord
+            if favorite:
+                # Lecture proportionnelle au nombre de favoris, du plus récemment ajouté au plus ancien
+                query = {
+                    "IndexName": FAVORITE_INDEX,
+                    "KeyConditionExpression": Key("userId").eq(user_id)
+                }
+                if album_id:
+                    query["FilterExpression"] = Attr("albumId").eq(album_id)
+            elif album_id:
+                query = {
+                    "IndexName": ALBUM_INDEX,
+                    "KeyConditionExpression": Key("albumId").eq(album_id),
+                    # L'album appartient à un seul utilisateur : le filtre ne porte que sur ses photos
+                    "FilterExpression": Attr("userId").eq(user_id)
+                }
+            else:
+                query = {
+                    "IndexName": USER_INDEX,
+                    "KeyConditionExpression": Key("userId").eq(user_id)
+                }
+
+            # Le jeton n'est valable que pour la même liste (utilisateur, album, favoris)
+            scope = f"{user_id}:{album_id or ''}:{'favorite' if favorite else ''}"
+            if params.get("nextToken"):
+                try:
+                    query["ExclusiveStartKey"] = decode_token(params["nextToken"], scope)
+                except ValueError:
+                    return respond(400, {"error": "nextToken invalide."})
+
+            # Les plus récentes d'abord. Avec un filtre (album), une page peut compter moins
+            # de `limit` photos : le filtre s'applique après la limite
+            response = table.query(ScanIndexForward=False, Limit=limit, **query)
+            items = response.get("Items", [])
+            last_key = response.get("LastEvaluatedKey")
+            next_token = encode_token(last_key, scope) if last_key else None
 
-        # Filtrage DynamoDB par userId (et albumId si fourni)
-        filter_expr = Attr('userId').eq(user_id)
-        if album_id:
-            filter_expr = filter_expr & Attr('albumId').eq(album_id)
-
-        # Scan DynamoDB
-        response = table.scan(FilterExpression=filter_expr)
-        items = response.get('Items', [])
-
-        photos = []
-        for item in items:
-            photo_key = item.get("photo")
-
-            # Générer une URL de téléchargement
-            download_url = s3.generate_presigned_url(
-                ClientMethod='get_object',
-                Params={
-                    'Bucket': bucket_name,
-                    'Key': photo_key,
-                    'ResponseContentDisposition': 'attachment'
-                },
-                ExpiresIn=3600
-            )
-
-            photos.append({
-                "photo": photo_key,
-                "labels": item.get("labels", []),
-                "albumId": item.get("albumId", None),
-                "description": item.get("description", ""),
-                "location": item.get("location", ""),
-                "uploadedAt": item.get("uploadedAt", None),
-                "download_url": download_url,
-                "isFavorite": item.get("isFavorite", False)  # ✅ Correction ici
-            })
-
-        return {
-            "statusCode": 200,
-            "headers": {
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "Content-Type,Authorization",
-                "Access-Control-Allow-Methods": "GET,OPTIONS"
-            },
-            "body": json.dumps(photos)
-        }
+        photos = [photo_response(item, min_confidence, max_labels) for item in items]
+
+        return respond(200, {
+            "photos": photos,
+            "count": len(photos),
+            # Absent (null) sur la dernière page
+            "nextToken": next_token
+        })
 
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": {
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "Content-Type,Authorization",
-                "Access-Control-Allow-Methods": "GET,OPTIONS"
-            },
-            "body": json.dumps({"error": str(e)})
-        }
+        return respond(500, {"error": str(e)})
+
+def search_labels(user_id, labels, match_all, min_confidence, limit, cursor):
+    # Retourne (photos, curseur). Le curseur est la clé de tri « uploadedAt#photo » de la
+    # dernière entrée retenue : une photo a la même dans toutes ses partitions d'étiquettes,
+    # la page suivante reprend donc en dessous dans chacune
+    streams = [label_entries(user_id, label, min_confidence, cursor, limit) for label in labels]
+    if match_all:
+        matches = all_labels(user_id, streams[0], labels[1:], min_confidence, limit)
+    else:
+        matches = any_labels(streams)
+
+    entries = []
+    for entry in matches:
+        entries.append(entry)
+        if len(entries) == limit:
+            break
+    cursor = entries[-1]["sortKey"] if len(entries) == limit else None
+
+    photos = {item["photo"]: item for item in batch_get(table, [{"photo": entry["photo"]} for entry in entries])}
+    # Ordre de l'index conservé ; une photo supprimée entre-temps est ignorée
+    return [photos[entry["photo"]] for entry in entries if entry["photo"] in photos], cursor
+
+def label_entries(user_id, label, min_confidence, cursor, page_size):
+    # Une partition de l'index, des plus récentes aux plus anciennes, lue page par page à la demande
+    condition = Key("labelKey").eq(f"{user_id}#{label}")
+    if cursor:
+        condition = condition & Key("sortKey").lt(cursor)
+    query = {
+        "KeyConditionExpression": condition,
+        "FilterExpression": Attr("confidence").gte(Decimal(str(min_confidence))),
+        "ScanIndexForward": False,
+        "Limit": page_size
+    }
+    while True:
+        response = label_index_table.query(**query)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def all_labels(user_id, driver, others, min_confidence, chunk_size):
+    # ET : la première étiquette mène la lecture ; les autres sont vérifiées par BatchGetItem
+    # sur les mêmes clés de tri, sans parcourir leurs partitions
+    chunk = []
+    for entry in driver:
+        chunk.append(entry)
+        if len(chunk) == chunk_size:
+            yield from confirm_labels(user_id, chunk, others, min_confidence)
+            chunk = []
+    yield from confirm_labels(user_id, chunk, others, min_confidence)
+
+def confirm_labels(user_id, entries, others, min_confidence):
+    if not entries or not others:
+        yield from entries
+        return
+    keys = [
+        {"labelKey": f"{user_id}#{label}", "sortKey": entry["sortKey"]}
+        for entry in entries
+        for label in others
+    ]
+    found = {
+        (item["labelKey"], item["sortKey"])
+        for item in batch_get(label_index_table, keys)
+        if item["confidence"] >= Decimal(str(min_confidence))
+    }
+    for entry in entries:
+        if all((f"{user_id}#{label}", entry["sortKey"]) in found for label in others):
+            yield entry
+
+def any_labels(streams):
+    # OU : fusion des partitions par clé de tri décroissante, chaque photo une seule fois
+    previous = None
+    for entry in heapq.merge(*streams, key=lambda entry: entry["sortKey"], reverse=True):
+        if entry["sortKey"] != previous:
+            previous = entry["sortKey"]
+            yield entry
+
+def batch_get(target, keys):
+    items = []
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {target.name: {"Keys": keys[start:start + BATCH_GET_SIZE]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response["Responses"].get(target.name, []))
+            request = response.get("UnprocessedKeys")
+    return items
+
+def respond(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Content-Type,Authorization",
+            "Access-Control-Allow-Methods": "GET,OPTIONS"
+        },
+        "body": json.dumps(body)
+    }
+
+def encode_token(last_key, scope):
+    # Jeton opaque : clé DynamoDB + liste concernée, signés HMAC-SHA256.
+    # Un jeton modifié ou pris sur une autre liste est refusé
+    payload = base64.urlsafe_b64encode(json.dumps({"k": last_key, "s": scope}).encode()).rstrip(b"=")
+    signature = base64.urlsafe_b64encode(hmac.new(pagination_secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+    return (payload + b"." + signature).decode()
+
+def decode_token(token, scope):
+    payload, _, signature = token.encode().partition(b".")
+    expected = base64.urlsafe_b64encode(hmac.new(pagination_secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+    if not hmac.compare_digest(signature, expected):
+        raise ValueError("signature invalide")
+    data = json.loads(base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4)))
+    if data.get("s") != scope:
+        raise ValueError("jeton d'une autre liste")
+    return data["k"]
+
+def photo_response(item, min_confidence, max_labels):
+    photo_key = item.get("photo")
+
+    # URL par taille : le client ne télécharge que la taille qu'il affiche
+    urls = {
+        size: presigned_url(derivative)
+        for size, derivative in item.get("derivatives", {}).items()
+    }
+    # Dérivés pas encore produits (traitement reporté) : l'original les remplace
+    if "medium" not in urls or "thumb" not in urls:
+        original = presigned_url(photo_key)
+        urls.setdefault("medium", original)
+        urls.setdefault("thumb", original)
+    # L'original sert au téléchargement (Content-Disposition: attachment)
+    urls["full"] = presigned_url(photo_key, attachment=True)
+
+    return {
+        "photo": photo_key,
+        "labels": select_labels(item, min_confidence, max_labels),
+        "albumId": item.get("albumId", None),
+        "description": item.get("description", ""),
+        "location": item.get("location", ""),
+        "uploadedAt": item.get("uploadedAt", None),
+        "takenAt": item.get("takenAt", None),
+        "latitude": float(item["latitude"]) if "latitude" in item else None,
+        "longitude": float(item["longitude"]) if "longitude" in item else None,
+        "download_url": urls["full"],
+        "urls": urls,
+        "isFavorite": item.get("isFavorite", False)
+    }
+
+def select_labels(item, min_confidence, max_labels):
+    # labelDetail : JSON compressé de lignes [nom, confiance, parents, catégories, instances]
+    # par confiance décroissante (voir analyze_photo)
+    if "labelDetail" not in item:
+        # Photo analysée avant labelDetail : seuls les noms au-dessus de 80 % sont connus
+        return item.get("labels", [])[:max_labels]
+    rows = json.loads(zlib.decompress(item["labelDetail"].value))
+    return [row[0] for row in rows if row[1] >= min_confidence][:max_labels]
+
+def presigned_url(key, attachment=False):
+    params = {
+        'Bucket': bucket_name,
+        'Key': key
+    }
+    if attachment:
+        params['ResponseContentDisposition'] = 'attachment'
+    return s3.generate_presigned_url(
+        ClientMethod='get_object',
+        Params=params,
+        ExpiresIn=3600
+    )
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# Crée les index secondaires globaux (GSI) des tables PhotoLabels et Albums.
+# Ces tables existaient avant la stack SAM et n’y sont pas déclarées : leurs index
+# sont gérés ici. Idempotent : les index déjà présents sont ignorés.
+# Les éléments anciens privés d’une clé de tri d’index la reçoivent d’abord (BACKFILL).
+#
+#   python scripts/ensure_indexes.py                  # crée les index manquants et attend
+#   python scripts/ensure_indexes.py --dry-run        # affiche seulement ce qui manque
+#
+# DynamoDB ne crée qu’un GSI à la fois par table : chaque création attend
+# que l’index soit ACTIVE (remplissage des éléments existants) avant la suivante.
+import argparse
+import time
+import boto3
+
+# Noms repris par les Lambdas de lecture (listPhotos, listAlbums)
+INDEXES = {
+    'PhotoLabels': [
+        # Bibliothèque d’un utilisateur, de la plus récente à la plus ancienne
+        {'name': 'userId-uploadedAt', 'hash': 'userId', 'range': 'uploadedAt'},
+        # Contenu d’un album, même ordre
+        {'name': 'albumId-uploadedAt', 'hash': 'albumId', 'range': 'uploadedAt'},
+        # Index creux des favoris : favoritedAt n’existe que sur eux (toggle_favorite)
+        {'name': 'userId-favoritedAt', 'hash': 'userId', 'range': 'favoritedAt'},
+    ],
+    'Albums': [
+        {'name': 'userId-createdAt', 'hash': 'userId', 'range': 'createdAt'},
+    ],
+}
+# Valeurs posées sur les éléments sans l’attribut (et, avec only_if, dont cet attribut
+# booléen est vrai) : sans elles, l’élément n’apparaîtrait pas dans l’index.
+# Les albums antérieurs à createdAt et les favoris antérieurs à favoritedAt passent en fin de liste
+BACKFILL = {
+    'PhotoLabels': [{'attribute': 'favoritedAt', 'value': '1970-01-01T00:00:00', 'only_if': 'isFavorite'}],
+    'Albums': [{'attribute': 'createdAt', 'value': '1970-01-01T00:00:00'}],
+}
+POLL_SECONDS = 15
+
+def main():
+    parser = argparse.ArgumentParser(description="Crée les GSI manquants de PhotoLabels et Albums")
+    parser.add_argument('--dry-run', action='store_true', help="n’affiche que les index manquants")
+    parser.add_argument('--region', help="région AWS (défaut : configuration locale)")
+    args = parser.parse_args()
+
+    client = boto3.client('dynamodb', region_name=args.region)
+    for table_name, indexes in INDEXES.items():
+        for spec in BACKFILL.get(table_name, []):
+            backfill(client, table_name, spec, args.dry_run)
+        for index in indexes:
+            ensure_index(client, table_name, index, args.dry_run)
+
+def backfill(client, table_name, spec, dry_run=False):
+    attribute = spec['attribute']
+    key_names = [key['AttributeName'] for key in client.describe_table(TableName=table_name)['Table']['KeySchema']]
+    names = {'#a': attribute, **{f"#k{i}": name for i, name in enumerate(key_names)}}
+    missing = 'attribute_not_exists(#a)'
+    flag = {}
+    if spec.get('only_if'):
+        names['#w'] = spec['only_if']
+        missing += ' AND #w = :true'
+        flag = {':true': {'BOOL': True}}
+    scan = {
+        'TableName': table_name,
+        'FilterExpression': missing,
+        'ProjectionExpression': ', '.join(f"#k{i}" for i in range(len(key_names))),
+        'ExpressionAttributeNames': names,
+    }
+    if flag:
+        scan['ExpressionAttributeValues'] = flag
+    updated = 0
+    for page in client.get_paginator('scan').paginate(**scan):
+        for item in page['Items']:
+            if not dry_run:
+                try:
+                    # Élément supprimé (ou favori retiré) depuis le scan : on ne recrée pas
+                    # une coquille vide et on n’indexe pas un ancien favori
+                    client.update_item(
+                        TableName=table_name,
+                        Key=item,
+                        UpdateExpression='SET #a = :v',
+                        ConditionExpression=f"attribute_exists(#k0) AND {missing}",
+                        ExpressionAttributeNames={name: value for name, value in names.items() if name in ('#a', '#k0', '#w')},
+                        ExpressionAttributeValues={':v': {'S': spec['value']}, **flag},
+                    )
+                except client.exceptions.ConditionalCheckFailedException:
+                    continue
+            updated += 1
+    print(f"{'➕' if dry_run else '🩹'} {table_name}.{attribute} : {updated} élément(s) {'à compléter' if dry_run else 'complété(s)'}")
+
+def ensure_index(client, table_name, index, dry_run=False):
+    table = client.describe_table(TableName=table_name)['Table']
+    existing = {gsi['IndexName'] for gsi in table.get('GlobalSecondaryIndexes', [])}
+    if index['name'] in existing:
+        print(f"✅ {table_name}.{index['name']} existe déjà")
+        return False
+    if dry_run:
+        print(f"➕ {table_name}.{index['name']} à créer")
+        return False
+
+    key_schema = [{'AttributeName': index['hash'], 'KeyType': 'HASH'}]
+    attributes = [{'AttributeName': index['hash'], 'AttributeType': 'S'}]
+    if index.get('range'):
+        key_schema.append({'AttributeName': index['range'], 'KeyType': 'RANGE'})
+        attributes.append({'AttributeName': index['range'], 'AttributeType': 'S'})
+
+    create = {
+        'IndexName': index['name'],
+        'KeySchema': key_schema,
+        # Projection complète : les listes sont servies par l’index seul, sans relecture de la table
+        'Projection': {'ProjectionType': 'ALL'},
+    }
+    # Tables provisionnées : l’index reprend la capacité de la table
+    if table.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+        throughput = table['ProvisionedThroughput']
+        create['ProvisionedThroughput'] = {
+            'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+            'WriteCapacityUnits': throughput['WriteCapacityUnits'],
+        }
+
+    print(f"🛠️ Création de {table_name}.{index['name']}…")
+    client.update_table(
+        TableName=table_name,
+        AttributeDefinitions=attributes,
+        GlobalSecondaryIndexUpdates=[{'Create': create}],
+    )
+    wait_until_active(client, table_name, index['name'])
+    return True
+
+def wait_until_active(client, table_name, index_name):
+    while True:
+        table = client.describe_table(TableName=table_name)['Table']
+        status = next(
+            (gsi['IndexStatus'] for gsi in table.get('GlobalSecondaryIndexes', []) if gsi['IndexName'] == index_name),
+            None
+        )
+        if status == 'ACTIVE' and table['TableStatus'] == 'ACTIVE':
+            print(f"✅ {table_name}.{index_name} actif")
+            return
+        print(f"⏳ {table_name}.{index_name} : {status}")
+        time.sleep(POLL_SECONDS)
+
+if __name__ == '__main__':
+    main()
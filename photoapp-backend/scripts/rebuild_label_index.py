@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# Reconstruit l’index inversé des étiquettes (PhotoLabelIndex) depuis PhotoLabels :
+# photos analysées avant l’index, ou index à réaligner après un incident.
+# Les entrées périmées d’une photo sont retirées, comme lors d’une ré-analyse.
+#
+#   python scripts/rebuild_label_index.py --index-table PhotoLabelIndex
+#   python scripts/rebuild_label_index.py --index-table PhotoLabelIndex --photo photo/abc.jpg
+#
+# Lit les tables en place : aucun appel à Rekognition.
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'analyze_photo'))
+
+import label_index
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruit l’index des étiquettes")
+    parser.add_argument('--table', default='PhotoLabels', help="table des photos")
+    parser.add_argument('--index-table', required=True, help="table de l’index (sortie LabelIndexTable de la stack)")
+    parser.add_argument('--photo', nargs='+', help="photos à réindexer (défaut : toutes)")
+    parser.add_argument('--workers', type=int, default=8, help="photos traitées en parallèle")
+    parser.add_argument('--region', help="région AWS (défaut : configuration locale)")
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', region_name=args.region)
+    photos = dynamodb.Table(args.table)
+    index = dynamodb.Table(args.index_table)
+
+    def rebuild(item):
+        detail = item.get('labelDetail')
+        confidences = label_index.expand(item.get('labels', []), detail.value if detail is not None else None)
+        return label_index.sync(index, item['photo'], item.get('userId'), item.get('uploadedAt'), confidences)
+
+    indexed = removed = count = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for written, stale in pool.map(rebuild, read_photos(photos, args.photo)):
+            indexed += written
+            removed += stale
+            count += 1
+            if count % 500 == 0:
+                print(f"⏳ {count} photos…")
+    print(f"✅ {count} photos, {indexed} entrée(s) écrites, {removed} retirée(s)")
+
+def read_photos(table, keys=None):
+    if keys:
+        for key in keys:
+            item = table.get_item(Key={'photo': key}).get('Item')
+            if item:
+                yield item
+        return
+    scan = {}
+    while True:
+        response = table.scan(**scan)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Reconstruit l’index plein texte de GET /search (PhotoSearchIndex) depuis PhotoLabels :
+# photos analysées avant l’index, changement de tokenisation, ou index à réaligner.
+# Les entrées périmées d’une photo sont retirées, comme lors d’une ré-analyse.
+#
+#   python scripts/rebuild_search_index.py --index-table PhotoSearchIndex
+#   python scripts/rebuild_search_index.py --index-table PhotoSearchIndex --photo photo/abc.jpg
+#   python scripts/rebuild_search_index.py --index-table PhotoSearchIndex --endpoint-url http://localhost:8000
+#
+# --endpoint-url vise DynamoDB Local (tests) au lieu d’AWS. Aucun appel à Rekognition.
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'analyze_photo'))
+
+import search_index
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruit l’index de recherche")
+    parser.add_argument('--table', default='PhotoLabels', help="table des photos")
+    parser.add_argument('--index-table', required=True, help="table de l’index (sortie SearchIndexTable de la stack)")
+    parser.add_argument('--photo', nargs='+', help="photos à réindexer (défaut : toutes)")
+    parser.add_argument('--workers', type=int, default=8, help="photos traitées en parallèle")
+    parser.add_argument('--region', help="région AWS (défaut : configuration locale)")
+    parser.add_argument('--endpoint-url', help="point d’accès DynamoDB (ex. DynamoDB Local)")
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', region_name=args.region, endpoint_url=args.endpoint_url)
+    photos = dynamodb.Table(args.table)
+    index = dynamodb.Table(args.index_table)
+
+    def rebuild(item):
+        return search_index.sync(
+            index, item['photo'], item.get('userId'), item.get('uploadedAt'), search_index.postings(item)
+        )
+
+    indexed = removed = count = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for written, stale in pool.map(rebuild, read_photos(photos, args.photo)):
+            indexed += written
+            removed += stale
+            count += 1
+            if count % 500 == 0:
+                print(f"⏳ {count} photos…")
+    print(f"✅ {count} photos, {indexed} terme(s) écrits, {removed} retiré(s)")
+
+def read_photos(table, keys=None):
+    if keys:
+        for key in keys:
+            item = table.get_item(Key={'photo': key}).get('Item')
+            if item:
+                yield item
+        return
+    scan = {}
+    while True:
+        response = table.scan(**scan)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+if __name__ == '__main__':
+    main()
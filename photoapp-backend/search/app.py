@@ -0,0 +1,320 @@
+import boto3
+import os
+import re
+import math
+import json
+import zlib
+import base64
+import hashlib
+import hmac
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+
+dynamodb = boto3.resource('dynamodb')
+table = dynamodb.Table(os.environ['PHOTO_LABELS_TABLE'])
+# Index plein texte (utilisateur, terme, photo) écrit par analyze_photo (voir search_index.py)
+search_index_table = dynamodb.Table(os.environ['SEARCH_INDEX_TABLE'])
+s3 = boto3.client('s3')
+bucket_name = os.environ['BUCKET_NAME']
+# Clé HMAC des jetons de pagination (secret généré par la stack)
+pagination_secret = os.environ['PAGINATION_SECRET'].encode()
+
+# Seuils par défaut des étiquettes affichées, comme listPhotos
+DEFAULT_MIN_CONFIDENCE = 80
+DEFAULT_MAX_LABELS = 10
+# Taille de page : ?limit=…, bornée pour garder des réponses rapides
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Requête bornée : chaque mot coûte une Query par trigramme
+MAX_QUERY_LENGTH = 100
+MAX_QUERY_TOKENS = 5
+# Part des trigrammes d'un mot de la requête à retrouver dans la photo :
+# « vacences » (faute de frappe) garde 5 trigrammes sur 8 de « vacances »
+MIN_SIMILARITY = 0.5
+# Bonus d'un mot trouvé en entier, devant les correspondances approchées
+EXACT_BONUS = 0.25
+# Entrées lues par trigramme et par lot : la lecture ne dépend pas de la taille de la bibliothèque
+PROBE_LIMIT = 100
+# Photos classées ensemble (un lot) ; au-delà, la suite vient au lot suivant
+BATCH_CANDIDATES = 100
+# Lots parcourus au plus pour remplir une page
+MAX_BATCHES_PER_PAGE = 5
+# Partitions de l'index lues en parallèle
+QUERY_WORKERS = 16
+# BatchGetItem : 100 clés par appel
+BATCH_GET_SIZE = 100
+# Tokenisation identique à analyze_photo/search_index.py
+MIN_TOKEN_LENGTH = 2
+
+executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS)
+
+def lambda_handler(event, context):
+    try:
+        # Authentification via Cognito
+        claims = event.get('requestContext', {}).get('authorizer', {}).get('claims', {})
+        user_id = claims.get('sub')
+        if not user_id:
+            raise Exception("Utilisateur non authentifié")
+
+        params = event.get('queryStringParameters') or {}
+        q = params.get('q', '')
+        try:
+            min_confidence = float(params.get('minConfidence', DEFAULT_MIN_CONFIDENCE))
+            max_labels = int(params.get('maxLabels', DEFAULT_MAX_LABELS))
+            limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return respond(400, {"error": "minConfidence, maxLabels et limit doivent être numériques."})
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return respond(400, {"error": f"limit doit être compris entre 1 et {MAX_PAGE_SIZE}."})
+        if len(q) > MAX_QUERY_LENGTH:
+            return respond(400, {"error": f"q ne doit pas dépasser {MAX_QUERY_LENGTH} caractères."})
+
+        words = list(dict.fromkeys(tokens(q)))
+        if not words:
+            return respond(400, {"error": f"q doit contenir un mot d'au moins {MIN_TOKEN_LENGTH} caractères."})
+        if len(words) > MAX_QUERY_TOKENS:
+            return respond(400, {"error": f"{MAX_QUERY_TOKENS} mots au plus."})
+
+        # Dernier mot en cours de saisie : préfixe (« vacan » -> « vacances »)
+        # Avec un espace final, il est complet
+        partial = not q[-1].isspace()
+
+        # Le jeton n'est valable que pour la même recherche. Il porte la fin du lot en cours
+        # (photos déjà classées, pas encore servies) et la clé où reprend le lot suivant :
+        # une page ne refait jamais le travail des précédentes
+        scope = f"{user_id}:search:{' '.join(words)}{'*' if partial else ''}:{min_confidence}"
+        ranked, after, more = [], None, True
+        if params.get("nextToken"):
+            try:
+                cursor = decode_token(params["nextToken"], scope)
+            except ValueError:
+                return respond(400, {"error": "nextToken invalide."})
+            ranked, after = cursor["r"], cursor["a"]
+            more = after is not None
+
+        batches = 0
+        while len(ranked) < limit and more and batches < MAX_BATCHES_PER_PAGE:
+            results, after = search_batch(user_id, words, partial, after)
+            ranked.extend(results)
+            more = after is not None
+            batches += 1
+        page = ranked[:limit]
+        rest = ranked[limit:]
+        next_token = encode_token({"r": rest, "a": after}, scope) if rest or more else None
+
+        items = {item["photo"]: item for item in batch_get(table, [{"photo": photo_key} for photo_key, _ in page])}
+        photos = []
+        for photo_key, score in page:
+            # Photo supprimée entre l'écriture de l'index et la lecture : ignorée
+            if photo_key in items:
+                photos.append({**photo_response(items[photo_key], min_confidence, max_labels), "score": score})
+
+        return respond(200, {
+            "photos": photos,
+            "count": len(photos),
+            # Absent (null) sur la dernière page
+            "nextToken": next_token
+        })
+
+    except Exception as e:
+        return respond(500, {"error": str(e)})
+
+def search_batch(user_id, words, partial, after):
+    # Un lot de photos de clé > after. Retourne ([[photo, score]] du meilleur au plus récent,
+    # clé où reprend le lot suivant ou None pour le dernier).
+    # Chaque mot de la requête doit retrouver au moins MIN_SIMILARITY de ses trigrammes dans
+    # la photo (ET entre les mots). Score d'un mot : somme des poids (champ) des trigrammes
+    # trouvés / nombre de trigrammes, plus EXACT_BONUS si le mot entier y figure ; score de
+    # la photo : moyenne sur les mots. Le classement vaut pour le lot : toute la recherche
+    # quand les trigrammes rares tiennent dans un lot, cas d'une requête sélective
+    grams = {
+        word: sorted(trigrams(word, partial=partial and index == len(words) - 1))
+        for index, word in enumerate(words)
+    }
+    terms = {f"t:{gram}" for word_grams in grams.values() for gram in word_grams}
+    terms.update(f"w:{word}" for word in words)
+    postings = dict(zip(terms, executor.map(lambda term: term_page(user_id, term, after), terms)))
+
+    # Candidats : les photos des trigrammes les plus rares du mot le plus sélectif. Sur n
+    # trigrammes dont k à retrouver, toute photo qui correspond au mot contient l'un des
+    # n - k + 1 plus rares. Un trigramme lu en partie ne couvre les clés que jusqu'à sa
+    # dernière entrée : le lot s'arrête là
+    plans = []
+    for word, word_grams in grams.items():
+        needed = math.ceil(len(word_grams) * MIN_SIMILARITY)
+        pages = sorted((postings[f"t:{gram}"] for gram in word_grams), key=lambda page: (page[1] is not None, len(page[0])))
+        drivers = pages[:len(word_grams) - needed + 1]
+        ends = [last for _, last in drivers if last is not None]
+        end = min(ends) if ends else None
+        candidates = {photo for entries, _ in drivers for photo in entries if end is None or photo <= end}
+        plans.append({"word": word, "end": end, "candidates": candidates})
+    plan = min(plans, key=lambda plan: (plan["end"] is not None, len(plan["candidates"])))
+    candidates, end = plan["candidates"], plan["end"]
+    if len(candidates) > BATCH_CANDIDATES:
+        candidates = sorted(candidates)[:BATCH_CANDIDATES]
+        end = candidates[-1]
+
+    # Mot le plus sélectif d'abord : les mots suivants ne vérifient que les photos restantes
+    uploaded = {}
+    scores = dict.fromkeys(candidates, 0.0)
+    for word in [plan["word"]] + [word for word in words if word != plan["word"]]:
+        word_terms = [f"t:{gram}" for gram in grams[word]] + [f"w:{word}"]
+        # Entrées au-delà de la page lue pour un terme : lues par clé (BatchGetItem)
+        found = lookup(user_id, [
+            (term, photo)
+            for term in word_terms
+            for photo in scores
+            if postings[term][1] is not None and photo > postings[term][1]
+        ])
+
+        word_scores = {}
+        for photo in scores:
+            entries = {term: postings[term][0].get(photo) or found.get((term, photo)) for term in word_terms}
+            matched = [entries[f"t:{gram}"] for gram in grams[word] if entries[f"t:{gram}"]]
+            if len(matched) / len(grams[word]) < MIN_SIMILARITY:
+                continue
+            exact = entries[f"w:{word}"]
+            word_scores[photo] = (
+                sum(float(entry["weight"]) for entry in matched) / len(grams[word])
+                + EXACT_BONUS * (float(exact["weight"]) if exact else 0)
+            )
+            uploaded[photo] = matched[0].get("uploadedAt", "")
+        scores = {photo: score + word_scores[photo] for photo, score in scores.items() if photo in word_scores}
+        if not scores:
+            break
+
+    # Score décroissant, puis les plus récentes d'abord (tri stable)
+    ranked = sorted(((photo, score / len(words)) for photo, score in scores.items()), key=lambda result: uploaded[result[0]], reverse=True)
+    ranked.sort(key=lambda result: result[1], reverse=True)
+    return [[photo, round(score, 3)] for photo, score in ranked], end
+
+def term_page(user_id, term, after):
+    # Au plus PROBE_LIMIT entrées d'une partition, à partir de la clé after.
+    # Retourne ({photo: entrée}, dernière clé lue si la partition continue, sinon None)
+    term_key = f"{user_id}#{term}"
+    query = {
+        "KeyConditionExpression": Key("termKey").eq(term_key),
+        "Limit": PROBE_LIMIT
+    }
+    if after:
+        query["ExclusiveStartKey"] = {"termKey": term_key, "photo": after}
+    response = search_index_table.query(**query)
+    entries = {entry["photo"]: entry for entry in response.get("Items", [])}
+    return entries, response["LastEvaluatedKey"]["photo"] if "LastEvaluatedKey" in response else None
+
+def lookup(user_id, pairs):
+    # {(terme, photo): entrée} pour les couples présents dans l'index
+    keys = [{"termKey": f"{user_id}#{term}", "photo": photo} for term, photo in pairs]
+    chunks = [keys[start:start + BATCH_GET_SIZE] for start in range(0, len(keys), BATCH_GET_SIZE)]
+    found = {}
+    for items in executor.map(lambda chunk: batch_get(search_index_table, chunk), chunks):
+        for item in items:
+            found[(item["termKey"][len(user_id) + 1:], item["photo"])] = item
+    return found
+
+def fold(text):
+    # « Été à Paris » -> « ete a paris »
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def tokens(text):
+    return [token for token in re.findall(r'[a-z0-9]+', fold(text)) if len(token) >= MIN_TOKEN_LENGTH]
+
+def trigrams(token, partial=False):
+    # Bornes de mot marquées par des espaces : « pari » -> « pa », par, ari, « ri ».
+    # partial : mot en cours de saisie, sans borne de fin (« vacan » retrouve « vacances »)
+    padded = f" {token}" if partial else f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def batch_get(target, keys):
+    items = []
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request = {target.name: {"Keys": keys[start:start + BATCH_GET_SIZE]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response["Responses"].get(target.name, []))
+            request = response.get("UnprocessedKeys")
+    return items
+
+def respond(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Content-Type,Authorization",
+            "Access-Control-Allow-Methods": "GET,OPTIONS"
+        },
+        "body": json.dumps(body)
+    }
+
+def encode_token(cursor, scope):
+    # Jeton opaque : curseur de la recherche + recherche concernée, signés HMAC-SHA256.
+    # Un jeton modifié ou pris sur une autre recherche est refusé. Compressé : le curseur
+    # porte jusqu'à BATCH_CANDIDATES clés de photos
+    payload = base64.urlsafe_b64encode(zlib.compress(json.dumps({"k": cursor, "s": scope}).encode())).rstrip(b"=")
+    signature = base64.urlsafe_b64encode(hmac.new(pagination_secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+    return (payload + b"." + signature).decode()
+
+def decode_token(token, scope):
+    payload, _, signature = token.encode().partition(b".")
+    expected = base64.urlsafe_b64encode(hmac.new(pagination_secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+    if not hmac.compare_digest(signature, expected):
+        raise ValueError("signature invalide")
+    data = json.loads(zlib.decompress(base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4))))
+    if data.get("s") != scope or not isinstance(data.get("k"), dict):
+        raise ValueError("jeton d'une autre recherche")
+    return data["k"]
+
+def photo_response(item, min_confidence, max_labels):
+    photo_key = item.get("photo")
+
+    # URL par taille : le client ne télécharge que la taille qu'il affiche
+    urls = {
+        size: presigned_url(derivative)
+        for size, derivative in item.get("derivatives", {}).items()
+    }
+    # Dérivés pas encore produits (traitement reporté) : l'original les remplace
+    if "medium" not in urls or "thumb" not in urls:
+        original = presigned_url(photo_key)
+        urls.setdefault("medium", original)
+        urls.setdefault("thumb", original)
+    # L'original sert au téléchargement (Content-Disposition: attachment)
+    urls["full"] = presigned_url(photo_key, attachment=True)
+
+    return {
+        "photo": photo_key,
+        "labels": select_labels(item, min_confidence, max_labels),
+        "albumId": item.get("albumId", None),
+        "description": item.get("description", ""),
+        "location": item.get("location", ""),
+        "uploadedAt": item.get("uploadedAt", None),
+        "takenAt": item.get("takenAt", None),
+        "latitude": float(item["latitude"]) if "latitude" in item else None,
+        "longitude": float(item["longitude"]) if "longitude" in item else None,
+        "download_url": urls["full"],
+        "urls": urls,
+        "isFavorite": item.get("isFavorite", False)
+    }
+
+def select_labels(item, min_confidence, max_labels):
+    # labelDetail : JSON compressé de lignes [nom, confiance, parents, catégories, instances]
+    # par confiance décroissante (voir analyze_photo)
+    if "labelDetail" not in item:
+        # Photo analysée avant labelDetail : seuls les noms au-dessus de 80 % sont connus
+        return item.get("labels", [])[:max_labels]
+    rows = json.loads(zlib.decompress(item["labelDetail"].value))
+    return [row[0] for row in rows if row[1] >= min_confidence][:max_labels]
+
+def presigned_url(key, attachment=False):
+    params = {
+        'Bucket': bucket_name,
+        'Key': key
+    }
+    if attachment:
+        params['ResponseContentDisposition'] = 'attachment'
+    return s3.generate_presigned_url(
+        ClientMethod='get_object',
+        Params=params,
+        ExpiresIn=3600
+    )
@@ -0,0 +1,26 @@
+import importlib.util
+import os
+import sys
+
+# Les Lambdas créent leurs clients AWS à l’import : aucune requête n’est envoyée par les tests
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYZE_PHOTO = os.path.join(ROOT, 'analyze_photo')
+BENCHMARKS = os.path.join(ROOT, 'benchmarks')
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-2')
+for name in ('TABLE_NAME', 'CACHE_TABLE', 'JOBS_TABLE', 'LABEL_INDEX_TABLE', 'SEARCH_INDEX_TABLE',
+             'PHOTO_LABELS_TABLE', 'BUCKET_NAME', 'PAGINATION_SECRET'):
+    os.environ.setdefault(name, 'test')
+for path in (ANALYZE_PHOTO, BENCHMARKS):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+def load_function(directory):
+    # Chaque Lambda a son propre app.py : chargé sous le nom de son dossier
+    return load_module(os.path.join(directory, 'app.py'), directory)
+
+def load_module(path, name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,50 @@
+import random
+import unittest
+from PIL import Image, ImageEnhance
+import support  # environnement et chemins, avant app
+
+import app
+
+def reference(image):
+    # Ancien traitement : deux passes ImageEnhance, une image intermédiaire chacune
+    image = ImageEnhance.Contrast(image).enhance(app.CONTRAST)
+    return ImageEnhance.Brightness(image).enhance(app.BRIGHTNESS)
+
+def noise(seed, size=(64, 48)):
+    rng = random.Random(seed)
+    return Image.frombytes('RGB', size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+
+def gradient(size=(256, 64)):
+    image = Image.new('RGB', size)
+    image.putdata([(x, (x + y) % 256, 255 - x) for y in range(size[1]) for x in range(size[0])])
+    return image
+
+class EnhanceEquivalenceTest(unittest.TestCase):
+    # La table de correspondance doit produire exactement les pixels de l’ancien traitement
+
+    def assert_same_pixels(self, image):
+        self.assertEqual(app.enhance(image.copy()).tobytes(), reference(image).tobytes())
+
+    def test_random_images(self):
+        for seed in range(300):
+            with self.subTest(seed=seed):
+                self.assert_same_pixels(noise(seed))
+
+    def test_gradient(self):
+        self.assert_same_pixels(gradient())
+
+    def test_flat_images(self):
+        # Extrêmes : la moyenne sature les bornes 0 et 255
+        for color in ((0, 0, 0), (255, 255, 255), (128, 128, 128), (250, 10, 130)):
+            with self.subTest(color=color):
+                self.assert_same_pixels(Image.new('RGB', (16, 16), color))
+
+    def test_luma_mean_matches_contrast(self):
+        for seed in range(300):
+            image = noise(seed)
+            with self.subTest(seed=seed):
+                expected = int(sum(image.convert('L').getdata()) / (image.width * image.height) + 0.5)
+                self.assertEqual(app.luma_mean(image), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import random
+import unittest
+from PIL import Image
+import support  # environnement et chemins, avant app
+
+import app
+import metrics
+from bench_ingest import BENCH_PIPELINE
+from standins import LocalRekognition, LocalS3
+
+# Unités acceptées par CloudWatch pour les métriques émises ici
+UNITS = {'Milliseconds', 'Bytes', 'Megabytes', 'Count'}
+BUCKET = 'test'
+
+def photo_bytes(size=(640, 480)):
+    rng = random.Random(7)
+    image = Image.frombytes('RGB', size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=95)
+    return output.getvalue()
+
+class IngestMetricsTest(unittest.TestCase):
+    # Une ingestion par les remplaçants locaux (comme bench_ingest) : les lignes EMF
+    # doivent être exploitables telles quelles par CloudWatch
+
+    @classmethod
+    def setUpClass(cls):
+        clients = app.s3, app.rekognition
+        app.s3 = LocalS3()
+        app.rekognition = LocalRekognition()
+        try:
+            app.s3.put_object(Bucket=BUCKET, Key='photo/metrics.jpg', Body=photo_bytes())
+            job = {'bucket': BUCKET, 'key': 'photo/metrics.jpg', 'deadline': app.budget.Budget(), 'fields': {}}
+            logs = io.StringIO()
+            with contextlib.redirect_stdout(logs):
+                app.run_pipeline(job, BENCH_PIPELINE)
+        finally:
+            app.s3, app.rekognition = clients
+        cls.records = metrics.parse(logs.getvalue().splitlines())
+
+    def test_records_are_valid_emf(self):
+        self.assertTrue(self.records)
+        for record in self.records:
+            with self.subTest(record=record):
+                directive, = record['_aws']['CloudWatchMetrics']
+                self.assertEqual(directive['Namespace'], metrics.NAMESPACE)
+                self.assertIsInstance(record['_aws']['Timestamp'], int)
+                # Chaque dimension et chaque métrique déclarées ont leur valeur à la racine
+                for dimension_set in directive['Dimensions']:
+                    for name in dimension_set:
+                        self.assertIsInstance(record[name], str)
+                for metric in directive['Metrics']:
+                    self.assertIn(metric['Unit'], UNITS)
+                    self.assertIsInstance(record[metric['Name']], (int, float))
+
+    def test_one_record_per_stage(self):
+        stages = [record['Stage'] for record in self.records if 'Stage' in record]
+        self.assertEqual(stages, [name for name in BENCH_PIPELINE if name in stages])
+        self.assertIn('analyze', stages)
+        for record in self.records:
+            if 'Stage' in record:
+                directive, = record['_aws']['CloudWatchMetrics']
+                self.assertEqual(directive['Dimensions'], [['Stage']])
+                self.assertEqual(
+                    {metric['Name']: metric['Unit'] for metric in directive['Metrics']},
+                    {'StageDuration': 'Milliseconds', 'StageBytesIn': 'Bytes', 'StageBytesOut': 'Bytes'}
+                )
+
+    def test_summary(self):
+        summary, = [record for record in self.records if 'IngestDuration' in record]
+        directive, = summary['_aws']['CloudWatchMetrics']
+        self.assertEqual(directive['Dimensions'], [['ColdStart']])
+        units = {metric['Name']: metric['Unit'] for metric in directive['Metrics']}
+        self.assertEqual(units['IngestDuration'], 'Milliseconds')
+        self.assertEqual(units['SourcePixels'], 'Count')
+        self.assertEqual(units['OutputBytes'], 'Bytes')
+        self.assertEqual(summary['SourcePixels'], 640 * 480)
+        self.assertEqual(summary['outcome'], 'succeeded')
+        if app.peak_memory_mb() is not None:
+            self.assertEqual(units['PeakMemory'], 'Megabytes')
+
+if __name__ == '__main__':
+    unittest.main()
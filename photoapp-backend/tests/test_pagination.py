@@ -0,0 +1,69 @@
+import base64
+import json
+import unittest
+import support
+
+list_photos = support.load_function('listPhotos')
+
+LAST_KEY = {'photo': 'photo/1b2c.jpg', 'userId': 'user-1', 'uploadedAt': '2024-06-01T10:00:00'}
+
+def event(token, user_id='user-1', **params):
+    return {
+        'requestContext': {'authorizer': {'claims': {'sub': user_id}}},
+        'queryStringParameters': {'nextToken': token, **params}
+    }
+
+class PaginationTokenTest(unittest.TestCase):
+    # Jetons de listPhotos : la clé DynamoDB ne revient que signée, et pour la même liste
+
+    def test_round_trip(self):
+        token = list_photos.encode_token(LAST_KEY, 'user-1::')
+        self.assertEqual(list_photos.decode_token(token, 'user-1::'), LAST_KEY)
+        # Jeton transportable tel quel dans une URL
+        self.assertRegex(token, r'^[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+$')
+
+    def test_other_scope(self):
+        token = list_photos.encode_token(LAST_KEY, 'user-1::')
+        for scope in ('user-2::', 'user-1:album-1:', 'user-1::favorite'):
+            with self.subTest(scope=scope):
+                with self.assertRaises(ValueError):
+                    list_photos.decode_token(token, scope)
+
+    def test_tampered_payload(self):
+        token = list_photos.encode_token(LAST_KEY, 'user-1::')
+        _, signature = token.split('.')
+        forged = dict(LAST_KEY, userId='user-2')
+        payload = base64.urlsafe_b64encode(json.dumps({'k': forged, 's': 'user-1::'}).encode()).rstrip(b'=').decode()
+        with self.assertRaises(ValueError):
+            list_photos.decode_token(f"{payload}.{signature}", 'user-1::')
+
+    def test_tampered_signature(self):
+        token = list_photos.encode_token(LAST_KEY, 'user-1::')
+        payload, signature = token.split('.')
+        flipped = signature[:-1] + ('A' if signature[-1] != 'A' else 'B')
+        for candidate in (f"{payload}.{flipped}", payload, f"{payload}.", 'garbage', ''):
+            with self.subTest(token=candidate):
+                with self.assertRaises(ValueError):
+                    list_photos.decode_token(candidate, 'user-1::')
+
+    def test_other_secret(self):
+        token = list_photos.encode_token(LAST_KEY, 'user-1::')
+        secret = list_photos.pagination_secret
+        list_photos.pagination_secret = b'autre secret'
+        try:
+            with self.assertRaises(ValueError):
+                list_photos.decode_token(token, 'user-1::')
+        finally:
+            list_photos.pagination_secret = secret
+
+    def test_handler_rejects_invalid_token(self):
+        # Refus avant toute lecture DynamoDB
+        token = list_photos.encode_token(LAST_KEY, 'user-2::')
+        for params in ({}, {'albumId': 'album-1'}, {'label': 'dog'}):
+            with self.subTest(params=params):
+                response = list_photos.lambda_handler(event(token, **params), None)
+                self.assertEqual(response['statusCode'], 400)
+                self.assertEqual(json.loads(response['body']), {'error': 'nextToken invalide.'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import unittest
+from PIL import Image
+import support  # environnement et chemins, avant policy
+
+import policy
+
+def jpeg(quality, size=(64, 48)):
+    output = io.BytesIO()
+    Image.new('RGB', size, (90, 140, 200)).save(output, 'JPEG', quality=quality)
+    output.seek(0)
+    return Image.open(output)
+
+class EstimateJpegQualityTest(unittest.TestCase):
+    # Pillow encode avec les tables IJG : l’estimation doit retrouver la qualité demandée
+
+    def test_ijg_qualities(self):
+        for quality in range(20, 99):
+            with self.subTest(quality=quality):
+                self.assertEqual(policy.estimate_jpeg_quality(jpeg(quality).quantization[0]), quality)
+
+    def test_clamped_tables(self):
+        # Aux extrêmes les coefficients sont bornés (1 à 255) : l’estimation reste du bon côté
+        # du seuil MAX_SOURCE_QUALITY
+        for quality in (1, 5, 10):
+            with self.subTest(quality=quality):
+                self.assertLess(policy.estimate_jpeg_quality(jpeg(quality).quantization[0]), 20)
+        self.assertGreater(policy.estimate_jpeg_quality(jpeg(100).quantization[0]), policy.MAX_SOURCE_QUALITY)
+
+    def test_reference_table(self):
+        self.assertEqual(policy.estimate_jpeg_quality(policy.STANDARD_LUMINANCE), 50)
+
+    def test_unknown_table(self):
+        self.assertIsNone(policy.estimate_jpeg_quality(None))
+        self.assertIsNone(policy.estimate_jpeg_quality([]))
+        self.assertIsNone(policy.estimate_jpeg_quality(policy.STANDARD_LUMINANCE[:32]))
+
+    def test_inspect(self):
+        self.assertEqual(policy.inspect(jpeg(80)), {'quality': 80, 'mode': 'RGB', 'orientation': 1})
+        png = Image.new('RGBA', (8, 8))
+        png.format = 'PNG'
+        self.assertEqual(policy.inspect(png)['quality'], None)
+
+class ChooseTest(unittest.TestCase):
+    TARGET = (1024, 1024)
+
+    def header(self, width=800, height=600, size=100_000, image_format='jpeg'):
+        return {'format': image_format, 'width': width, 'height': height, 'size': size}
+
+    def source(self, quality=80, mode='RGB', orientation=1):
+        return {'quality': quality, 'mode': mode, 'orientation': orientation}
+
+    def test_decisions(self):
+        cases = [
+            (self.header(), self.source(), policy.PASS_THROUGH),
+            (self.header(image_format='png'), self.source(quality=None), policy.FULL),
+            (self.header(), self.source(quality=None), policy.FULL),
+            (self.header(), self.source(quality=95), policy.FULL),
+            (self.header(width=4000, height=3000), self.source(), policy.RESIZE),
+            (self.header(), self.source(orientation=6), policy.RESIZE),
+            (self.header(), self.source(mode='CMYK'), policy.RESIZE),
+            (self.header(size=800 * 600), self.source(), policy.RESIZE),
+        ]
+        for header, source, expected in cases:
+            with self.subTest(header=header, source=source):
+                self.assertEqual(policy.choose(header, source, self.TARGET)[0], expected)
+
+if __name__ == '__main__':
+    unittest.main()
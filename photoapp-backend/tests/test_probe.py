@@ -0,0 +1,86 @@
+import io
+import random
+import struct
+import unittest
+from unittest import mock
+from PIL import Image
+import support  # environnement et chemins, avant probe
+
+import probe
+from standins import LocalS3
+
+BUCKET = 'test'
+
+def encode(image_format, size=(320, 200), **options):
+    output = io.BytesIO()
+    Image.new('RGB', size, (30, 160, 90)).save(output, image_format, **options)
+    return output.getvalue()
+
+def png_header(width, height):
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+class ProbeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.s3 = LocalS3()
+
+    def probe(self, data):
+        self.s3.put_object(Bucket=BUCKET, Key='photo/probe', Body=data)
+        return probe.probe_object(self.s3, BUCKET, 'photo/probe')
+
+    def assert_rejected(self, data, status_code):
+        with self.assertRaises(probe.Rejected) as raised:
+            self.probe(data)
+        self.assertEqual(raised.exception.status_code, status_code)
+        return raised.exception.reason
+
+    def test_formats(self):
+        for image_format, name, options in (
+            ('JPEG', 'jpeg', {}),
+            ('JPEG', 'jpeg', {'progressive': True}),
+            ('PNG', 'png', {}),
+            ('GIF', 'gif', {}),
+            ('WEBP', 'webp', {}),
+            ('WEBP', 'webp', {'lossless': True}),
+        ):
+            data = encode(image_format, **options)
+            with self.subTest(format=image_format, options=options):
+                header = self.probe(data)
+                self.assertEqual(header['format'], name)
+                self.assertEqual((header['width'], header['height']), (320, 200))
+                self.assertEqual(header['size'], len(data))
+                self.assertEqual(header['head'], data[:probe.PROBE_BYTES])
+
+    def test_reads_only_the_header(self):
+        self.probe(encode('PNG', size=(2000, 2000)))
+        self.assertLessEqual(self.s3.bytes_read, probe.PROBE_BYTES)
+
+    def test_jpeg_segments_beyond_first_read(self):
+        # Profil ICC de 150 Ko (segments APP2) avant le SOF : lectures supplémentaires
+        icc = random.Random(3).randbytes(150 * 1024)
+        header = self.probe(encode('JPEG', icc_profile=icc))
+        self.assertEqual((header['width'], header['height']), (320, 200))
+        self.assertGreater(self.s3.bytes_read, probe.PROBE_BYTES)
+
+    def test_jpeg_header_out_of_reach(self):
+        icc = random.Random(3).randbytes(1024 * 1024)
+        self.assertEqual(self.assert_rejected(encode('JPEG', icc_profile=icc), 422), "En-tête JPEG introuvable")
+
+    def test_truncated_jpeg(self):
+        icc = random.Random(3).randbytes(150 * 1024)
+        data = encode('JPEG', icc_profile=icc)
+        self.assertEqual(self.assert_rejected(data[:100 * 1024], 422), "JPEG tronqué")
+
+    def test_rejections(self):
+        self.assert_rejected(b'', 422)
+        self.assert_rejected(b'%PDF-1.7\n' + bytes(100), 415)
+        self.assert_rejected(encode('PNG', size=(8, 8)), 422)
+        self.assert_rejected(png_header(20000, 20000), 413)
+        self.assert_rejected(png_header(320, 200)[:20], 422)
+
+    def test_object_too_large(self):
+        with mock.patch.object(probe, 'MAX_OBJECT_BYTES', 1024):
+            self.assert_rejected(encode('PNG', size=(320, 200)) + bytes(2048), 413)
+
+if __name__ == '__main__':
+    unittest.main()
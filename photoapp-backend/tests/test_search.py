@@ -0,0 +1,234 @@
+import inspect
+import json
+import random
+import unittest
+from decimal import Decimal
+from unittest import mock
+import support
+
+import search_index
+
+search = support.load_function('search')
+list_photos = support.load_function('listPhotos')
+rebuild_label_index = support.load_module('scripts/rebuild_label_index.py', 'rebuild_label_index')
+rebuild_search_index = support.load_module('scripts/rebuild_search_index.py', 'rebuild_search_index')
+
+PHOTOS = {
+    'photo/a.jpg': {'description': 'Vacances à Paris', 'location': 'Paris', 'labels': ['Beach'], 'uploadedAt': '2024-06-01'},
+    'photo/b.jpg': {'description': 'Mon chien au parc', 'location': 'Lyon', 'labels': ['Dog'], 'uploadedAt': '2024-06-02'},
+    'photo/c.jpg': {'description': 'Été à la montagne', 'location': 'Chamonix', 'labels': ['Mountain'], 'uploadedAt': '2024-06-03'},
+    'photo/d.jpg': {'description': 'Les vacances', 'location': 'Paris, France', 'labels': ['Tower'], 'uploadedAt': '2024-06-04'},
+}
+
+class MemoryIndex:
+    # PhotoSearchIndex en mémoire, écrit avec search_index.postings comme analyze_photo.
+    # Mêmes réponses que term_page et lookup : pages de PROBE_LIMIT entrées par clé croissante
+
+    def __init__(self, photos):
+        self.partitions = {}
+        self.pages = 0
+        for photo, fields in photos.items():
+            for term, weight in search_index.postings(fields).items():
+                self.partitions.setdefault(term, {})[photo] = {
+                    'termKey': search_index.term_key('user-1', term),
+                    'photo': photo,
+                    'weight': Decimal(str(weight)),
+                    'uploadedAt': fields['uploadedAt']
+                }
+
+    def term_page(self, user_id, term, after):
+        self.pages += 1
+        entries = [(photo, entry) for photo, entry in sorted(self.partitions.get(term, {}).items()) if after is None or photo > after]
+        entries = entries[:search.PROBE_LIMIT]
+        # DynamoDB renvoie LastEvaluatedKey dès que Limit est atteint
+        return dict(entries), entries[-1][0] if len(entries) == search.PROBE_LIMIT else None
+
+    def lookup(self, user_id, pairs):
+        return {(term, photo): self.partitions[term][photo] for term, photo in pairs if photo in self.partitions.get(term, {})}
+
+class TokenizerParityTest(unittest.TestCase):
+    # La requête doit produire exactement les termes écrits par analyze_photo
+    SAMPLES = [
+        'Été à Paris', 'ÉCOLE Noël 2024', 'Crème-brûlée', 'ça VA', 'MÜNCHEN Straße',
+        'naïve CAFÉ', 'ﬁlm ﬂeur', 'Ørsted Łódź', 'São Paulo', "l'été", 'x', '',
+    ]
+
+    def test_fold_and_tokens(self):
+        for text in self.SAMPLES:
+            with self.subTest(text=text):
+                self.assertEqual(search.fold(text), search_index.fold(text))
+                self.assertEqual(search.tokens(text), search_index.tokens(text))
+
+    def test_trigrams(self):
+        for text in self.SAMPLES:
+            for token in search.tokens(text):
+                for partial in (False, True):
+                    with self.subTest(token=token, partial=partial):
+                        self.assertEqual(search.trigrams(token, partial), search_index.trigrams(token, partial))
+
+    def test_query_terms_are_indexed(self):
+        # Requête accentuée et en majuscules contre une description sans accents, et inversement
+        for description, query in (('Ete a la montagne', 'ÉTÉ Montagne'), ('Été à Noël', 'ete NOEL')):
+            with self.subTest(description=description, query=query):
+                indexed = search_index.postings({'description': description})
+                for token in search.tokens(query):
+                    self.assertIn(f"w:{token}", indexed)
+                    for gram in search.trigrams(token):
+                        self.assertIn(f"t:{gram}", indexed)
+
+class DuplicatedHelpersTest(unittest.TestCase):
+    # Chaque Lambda est construite seule (CodeUri) : ces fonctions y sont copiées,
+    # les copies doivent rester identiques
+
+    def assert_same_source(self, name, *modules):
+        sources = {module.__name__: inspect.getsource(getattr(module, name)) for module in modules}
+        self.assertEqual(len(set(sources.values())), 1, f"{name} diverge entre {', '.join(sources)}")
+
+    def test_tokenizer(self):
+        self.assertEqual(search.MIN_TOKEN_LENGTH, search_index.MIN_TOKEN_LENGTH)
+        for name in ('fold', 'tokens', 'trigrams'):
+            self.assert_same_source(name, search, search_index)
+
+    def test_photo_serialization(self):
+        for name in ('photo_response', 'select_labels', 'presigned_url', 'batch_get'):
+            self.assert_same_source(name, search, list_photos)
+
+    def test_rebuild_scripts(self):
+        self.assert_same_source('read_photos', rebuild_label_index, rebuild_search_index)
+
+class SearchRankingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = MemoryIndex(PHOTOS)
+        for name in ('term_page', 'lookup'):
+            patcher = mock.patch.object(search, name, getattr(self.index, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_search(self, q):
+        # Tous les lots, dans l'ordre
+        words = list(dict.fromkeys(search.tokens(q)))
+        partial = not q[-1].isspace()
+        results, after = search.search_batch('user-1', words, partial, None)
+        while after is not None:
+            batch, after = search.search_batch('user-1', words, partial, after)
+            results.extend(batch)
+        return results
+
+    def photos(self, q):
+        return [photo for photo, _ in self.run_search(q)]
+
+    def test_prefix(self):
+        self.assertEqual(self.photos('vacan'), ['photo/d.jpg', 'photo/a.jpg'])
+        self.assertEqual(self.photos('pari'), ['photo/d.jpg', 'photo/a.jpg', 'photo/b.jpg'])
+
+    def test_typo(self):
+        self.assertEqual(set(self.photos('vacences')), {'photo/a.jpg', 'photo/d.jpg'})
+
+    def test_accents_and_case(self):
+        self.assertEqual(self.photos('ÉTÉ'), ['photo/c.jpg'])
+        self.assertEqual(self.photos('MONTAGNE ete'), ['photo/c.jpg'])
+
+    def test_all_words_required(self):
+        self.assertEqual(set(self.photos('paris vacan')), {'photo/a.jpg', 'photo/d.jpg'})
+        self.assertEqual(self.photos('paris chien'), [])
+        self.assertEqual(self.photos('zzz'), [])
+
+    def test_scores(self):
+        scores = lambda q: dict(self.run_search(q))
+        # Le mot entier devant le préfixe et la faute de frappe
+        self.assertGreater(scores('vacances ')['photo/d.jpg'], scores('vacan')['photo/d.jpg'])
+        self.assertGreater(scores('vacances ')['photo/d.jpg'], scores('vacences ')['photo/d.jpg'])
+        # Étiquette (1.0) devant lieu (0.8) devant description (0.6)
+        self.assertEqual(scores('dog ')['photo/b.jpg'], 1 + search.EXACT_BONUS)
+        self.assertEqual(scores('paris ')['photo/a.jpg'], 0.8 * (1 + search.EXACT_BONUS))
+        self.assertEqual(scores('chien ')['photo/b.jpg'], 0.6 * (1 + search.EXACT_BONUS))
+
+    def test_ties_newest_first(self):
+        results = self.run_search('vacan')
+        self.assertEqual(results[0][1], results[1][1])
+        self.assertEqual([photo for photo, _ in results], ['photo/d.jpg', 'photo/a.jpg'])
+
+class SearchBatchesTest(unittest.TestCase):
+    # Pages d'index et lots minuscules : la recherche par lots doit retrouver exactement
+    # les photos d'un parcours complet, sans doublon
+    WORDS = ['vacances', 'paris', 'plage', 'chien', 'chat', 'montagne', 'neige', 'famille', 'anniversaire', 'mer']
+
+    def library(self, size=120):
+        rng = random.Random(11)
+        return {
+            f"photo/{rng.getrandbits(64):016x}.jpg": {
+                'description': ' '.join(rng.sample(self.WORDS, 3)),
+                'uploadedAt': f"2024-{index:05d}"
+            }
+            for index in range(size)
+        }
+
+    def search_all(self, index, q, probe_limit, batch_candidates):
+        words = list(dict.fromkeys(search.tokens(q)))
+        with mock.patch.object(search, 'term_page', index.term_page), \
+                mock.patch.object(search, 'lookup', index.lookup), \
+                mock.patch.object(search, 'PROBE_LIMIT', probe_limit), \
+                mock.patch.object(search, 'BATCH_CANDIDATES', batch_candidates):
+            results, after, batches = [], None, 0
+            while True:
+                batch, after = search.search_batch('user-1', words, True, after)
+                results.extend(batch)
+                batches += 1
+                if after is None:
+                    return results, batches
+
+    def test_batches_match_full_search(self):
+        index = MemoryIndex(self.library())
+        for q in ('vacan', 'pa', 'chien plage', 'vacences', 'famille anniv', 'zz'):
+            with self.subTest(q=q):
+                expected, batches = self.search_all(index, q, 10_000, 10_000)
+                self.assertEqual(batches, 1)
+                found, batches = self.search_all(index, q, 7, 9)
+                self.assertEqual(len(found), len({photo for photo, _ in found}))
+                self.assertEqual(sorted(found), sorted(expected))
+                if len(expected) > 9:
+                    self.assertGreater(batches, 1)
+
+class SearchPaginationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = MemoryIndex(PHOTOS)
+        items = {photo: dict(fields, photo=photo, labels=fields['labels']) for photo, fields in PHOTOS.items()}
+        patches = {
+            'term_page': self.index.term_page,
+            'lookup': self.index.lookup,
+            'batch_get': lambda target, keys: [items[key['photo']] for key in keys if key['photo'] in items],
+            'presigned_url': lambda key, attachment=False: f"https://test/{key}",
+        }
+        for name, replacement in patches.items():
+            patcher = mock.patch.object(search, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def call(self, **params):
+        event = {'requestContext': {'authorizer': {'claims': {'sub': 'user-1'}}}, 'queryStringParameters': params}
+        response = search.lambda_handler(event, None)
+        return response['statusCode'], json.loads(response['body'])
+
+    def test_pages_follow_the_ranking(self):
+        status, first = self.call(q='pari', limit='2')
+        self.assertEqual(status, 200)
+        self.assertEqual([photo['photo'] for photo in first['photos']], ['photo/d.jpg', 'photo/a.jpg'])
+        pages = self.index.pages
+
+        status, second = self.call(q='pari', limit='2', nextToken=first['nextToken'])
+        self.assertEqual([photo['photo'] for photo in second['photos']], ['photo/b.jpg'])
+        self.assertIsNone(second['nextToken'])
+        # La suite du classement vient du jeton : aucune relecture de l'index
+        self.assertEqual(self.index.pages, pages)
+
+    def test_token_bound_to_query(self):
+        _, first = self.call(q='pari', limit='1')
+        for params in ({'q': 'vacan'}, {'q': 'pari '}, {'q': 'pari', 'minConfidence': '50'}):
+            with self.subTest(params=params):
+                status, body = self.call(nextToken=first['nextToken'], **params)
+                self.assertEqual((status, body), (400, {'error': 'nextToken invalide.'}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import json
 import boto3
 import os
+from datetime import datetime
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ['TABLE_NAME'])
@@ -21,15 +22,34 @@ def lambda_handler(event, context):
         if not photo_key or is_favorite is None:
             return respond(400, {"message": "Champs 'photo' et 'isFavorite' requis"})
 
-        # Mise à jour du champ isFavorite (et ajout userId s'il n'existe pas)
-        table.update_item(
-            Key={"photo": photo_key},
-            UpdateExpression="SET isFavorite = :val, userId = if_not_exists(userId, :uid)",
-            ExpressionAttributeValues={
-                ":val": is_favorite,
-                ":uid": user_id
-            }
-        )
+        # Mise à jour du champ isFavorite (et ajout userId s'il n'existe pas).
+        # favoritedAt n'existe que sur les favoris : l'index creux userId-favoritedAt
+        # (GET /photos?favorite=true) ne contient qu'eux. Un favori déjà posé garde sa date
+        values = {
+            ":val": is_favorite,
+            ":uid": user_id
+        }
+        if is_favorite:
+            update = "SET isFavorite = :val, userId = if_not_exists(userId, :uid), favoritedAt = if_not_exists(favoritedAt, :now)"
+            values[":now"] = datetime.utcnow().isoformat()
+        else:
+            update = "SET isFavorite = :val, userId = if_not_exists(userId, :uid) REMOVE favoritedAt"
+        try:
+            table.update_item(
+                Key={"photo": photo_key},
+                UpdateExpression=update,
+                # Photo existante uniquement : sinon update_item créerait un élément fantôme,
+                # visible dans l'index des favoris. Les favoris sont indexés par propriétaire :
+                # pas de favori sur la photo d'un autre
+                ConditionExpression="attribute_exists(photo) AND (attribute_not_exists(userId) OR userId = :uid)",
+                ExpressionAttributeValues=values,
+                ReturnValuesOnConditionCheckFailure="ALL_OLD"
+            )
+        except dynamodb.meta.client.exceptions.ConditionalCheckFailedException as e:
+            # Sans élément en retour, la photo n'existe pas
+            if "Item" not in e.response:
+                return respond(404, {"message": "Photo introuvable"})
+            return respond(403, {"message": "Photo d'un autre utilisateur"})
 
         print(f"✅ Statut favori mis à jour pour {photo_key} : {is_favorite}")
 
@@ -2,6 +2,7 @@ import os
 import json
 import boto3
 import uuid
+from urllib.parse import quote
 
 s3 = boto3.client('s3')
 bucket_name = os.environ['BUCKET_NAME']
@@ -11,16 +12,34 @@ def lambda_handler(event, context):
     photo_key = f"photo/{photo_id}.jpg"
 
     try:
-        # URL signée pour uploader l'image
+        claims = event.get("requestContext", {}).get("authorizer", {}).get("claims", {})
+        params = event.get("queryStringParameters") or {}
+
+        # Métadonnées liées à l'objet : l'analyse déclenchée par S3 les relit,
+        # aucun second appel /analyze n'est nécessaire
+        metadata = {
+            "user-id": claims.get("sub"),
+            "album-id": params.get("albumId"),
+            "description": params.get("description"),
+            "location": params.get("location")
+        }
+        # Encodage URL : les en-têtes x-amz-meta-* n'acceptent que l'ASCII
+        metadata = {name: quote(value) for name, value in metadata.items() if value}
+
+        # URL signée pour uploader l'image (le client doit renvoyer les mêmes en-têtes)
         upload_url = s3.generate_presigned_url(
             ClientMethod='put_object',
             Params={
                 'Bucket': bucket_name,
                 'Key': photo_key,
-                'ContentType': 'image/jpeg'
+                'ContentType': 'image/jpeg',
+                'Metadata': metadata
             },
             ExpiresIn=3600
         )
+        upload_headers = {"Content-Type": "image/jpeg"}
+        for name, value in metadata.items():
+            upload_headers[f"x-amz-meta-{name}"] = value
 
         # URL signée pour téléchargement avec Content-Disposition: attachment
         download_url = s3.generate_presigned_url(
@@ -43,6 +62,7 @@ def lambda_handler(event, context):
             },
             "body": json.dumps({
                 "upload_url": upload_url,
+                "upload_headers": upload_headers,
                 "photo_key": photo_key,
                 "download_url": download_url  # 👈 ajout ici
             })